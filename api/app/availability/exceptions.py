@@ -0,0 +1,16 @@
+from typing import Any, Optional
+
+from app.base.exceptions import BaseException
+
+
+class InvalidAvailabilityWindow(BaseException):
+    code = "INVALID_AVAILABILITY_WINDOW"
+    title = "Invalid Availability Window"
+
+    def __init__(
+        self,
+        detail: str = "Availability window start must be before its end",
+        context: Optional[dict[str, Any]] = None,
+        *args: object,
+    ) -> None:
+        super().__init__(detail, context, *args)
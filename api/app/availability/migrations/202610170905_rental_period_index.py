@@ -0,0 +1,21 @@
+# List of dependencies (migration that must be applied before this one)
+dependencies = ["orders.202508110732_initial"]
+
+# SQL to apply the migration
+apply = [
+    """--sql
+    CREATE EXTENSION IF NOT EXISTS btree_gist;
+    """,
+    """--sql
+    CREATE INDEX idx_orders_product_rent_period ON orders
+    USING gist (product_id, tstzrange(rent_start_date, rent_end_date))
+    WHERE order_status IN ('CONFIRMED', 'SHIPPED', 'DELIVERED');
+    """,
+]
+
+# SQL to rollback the migration
+rollback = [
+    """--sql
+    DROP INDEX IF EXISTS idx_orders_product_rent_period;
+    """,
+]
@@ -0,0 +1,21 @@
+from datetime import datetime
+from enum import Enum
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class Granularity(str, Enum):
+    DAY = "day"
+    HOUR = "hour"
+
+
+class ProductAvailability(BaseModel):
+    product_id: UUID = Field(..., description="The product identifier")
+    start: datetime = Field(..., description="Start of the first bucket")
+    end: datetime = Field(..., description="End of the last bucket")
+    granularity: Granularity = Field(..., description="Size of each bucket")
+    total_quantity: int = Field(..., description="Total quantity of the product")
+    free: list[int] = Field(
+        ..., description="Quantity free for the whole bucket, one entry per bucket"
+    )
@@ -0,0 +1,101 @@
+from datetime import datetime
+from uuid import UUID
+
+import asyncpg
+
+from app.base.instrumentation import instrumented
+from app.products.exceptions import ProductNotFound
+
+
+def peak_load_cte(start: str, end: str, product_filter: str = "") -> str:
+    """
+    Builds the `booked` and `peak_load` CTEs computing, per product, the highest
+    quantity rented out at any instant of the window [start, end).
+
+    Only orders holding stock (CONFIRMED, SHIPPED and DELIVERED) are considered.
+    The status list and the range expression are kept literal so the partial GiST
+    index `idx_orders_product_rent_period` can serve the overlap condition.
+
+    Args:
+        start (str): SQL expression (usually a placeholder) of the window start
+        end (str): SQL expression (usually a placeholder) of the window end
+        product_filter (str): Extra condition on `orders` to restrict the products
+
+    Returns:
+        str: CTE definitions, to be placed after `WITH`
+    """
+    return f"""
+    booked AS (
+        SELECT product_id, quantity,
+               greatest(rent_start_date, {start}) AS booked_from,
+               least(rent_end_date, {end}) AS booked_until
+        FROM orders
+        WHERE tstzrange(rent_start_date, rent_end_date) && tstzrange({start}, {end})
+          AND order_status IN ('CONFIRMED', 'SHIPPED', 'DELIVERED')
+          {product_filter}
+    ),
+    load_changes AS (
+        SELECT product_id, booked_from AS at, quantity AS delta FROM booked
+        UNION ALL
+        SELECT product_id, booked_until AS at, -quantity AS delta FROM booked
+    ),
+    peak_load AS (
+        -- Returns sort before rentals starting at the same instant as the
+        -- rental periods are half-open
+        SELECT product_id, max(load) AS peak
+        FROM (
+            SELECT product_id,
+                   sum(delta) OVER (
+                       PARTITION BY product_id ORDER BY at, delta
+                       ROWS UNBOUNDED PRECEDING
+                   ) AS load
+            FROM load_changes
+        ) AS running
+        GROUP BY product_id
+    )
+    """
+
+
+@instrumented
+class AvailabilityRepository:
+    def __init__(self, connection: asyncpg.Connection):
+        self.connection = connection
+
+    async def free_quantities(
+        self, product_ids: list[UUID], start: datetime, end: datetime
+    ) -> dict[UUID, int]:
+        """Quantity of each product that is free for the whole window"""
+        query = f"""
+        WITH {peak_load_cte("$2", "$3", "AND product_id = ANY($1::uuid[])")}
+        SELECT p.id, p.total_quantity - coalesce(pl.peak, 0) AS free
+        FROM products p
+        LEFT JOIN peak_load pl ON pl.product_id = p.id
+        WHERE p.id = ANY($1::uuid[]) AND p.is_deleted = FALSE
+        """
+        rows = await self.connection.fetch(query, product_ids, start, end)
+        return {row["id"]: max(row["free"], 0) for row in rows}
+
+    async def get_bookings(
+        self, product_id: UUID, start: datetime, end: datetime
+    ) -> tuple[int, list[tuple[datetime, datetime, int]]]:
+        """Total quantity of a product and its active rentals clipped to the window"""
+        query = """
+        SELECT p.total_quantity, o.quantity,
+               greatest(o.rent_start_date, $2) AS booked_from,
+               least(o.rent_end_date, $3) AS booked_until
+        FROM products p
+        LEFT JOIN orders o
+            ON o.product_id = p.id
+           AND tstzrange(o.rent_start_date, o.rent_end_date) && tstzrange($2, $3)
+           AND o.order_status IN ('CONFIRMED', 'SHIPPED', 'DELIVERED')
+        WHERE p.id = $1 AND p.is_deleted = FALSE
+        """
+        rows = await self.connection.fetch(query, product_id, start, end)
+        if not rows:
+            raise ProductNotFound(context={"product_id": str(product_id)})
+        bookings = [
+            (row["booked_from"], row["booked_until"], row["quantity"])
+            for row in rows
+            if row["quantity"] is not None
+        ]
+        return rows[0]["total_quantity"], bookings
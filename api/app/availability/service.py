@@ -0,0 +1,118 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from math import ceil
+from typing import Iterable
+from uuid import UUID
+
+from app.availability.exceptions import InvalidAvailabilityWindow
+from app.availability.models import Granularity, ProductAvailability
+from app.availability.repository import AvailabilityRepository
+
+BUCKET_WIDTHS = {
+    Granularity.DAY: timedelta(days=1),
+    Granularity.HOUR: timedelta(hours=1),
+}
+
+# Upper bound on the buckets of a calendar (93 days at an hourly granularity)
+MAX_BUCKETS = 93 * 24
+
+
+def peak_load_per_bucket(
+    bookings: list[tuple[datetime, datetime, int]],
+    start: datetime,
+    width: timedelta,
+    buckets: int,
+) -> list[int]:
+    """
+    Sweeps the booking start/end events once, in time order, recording the
+    highest load reached within each bucket of `width` starting at `start`.
+
+    Runs in O(E log E + B) for E bookings and B buckets.
+    """
+    origin = start.timestamp()
+    changes: dict[float, int] = defaultdict(int)
+    for booked_from, booked_until, quantity in bookings:
+        changes[booked_from.timestamp() - origin] += quantity
+        changes[booked_until.timestamp() - origin] -= quantity
+    events = sorted(changes.items())
+
+    step = width.total_seconds()
+    peaks = [0] * buckets
+    load = 0
+    position = 0
+    for bucket in range(buckets):
+        bucket_start = bucket * step
+        bucket_end = bucket_start + step
+        # Load carried into the bucket, including changes at its very start
+        while position < len(events) and events[position][0] <= bucket_start:
+            load += events[position][1]
+            position += 1
+        peak = load
+        while position < len(events) and events[position][0] < bucket_end:
+            load += events[position][1]
+            position += 1
+            peak = max(peak, load)
+        peaks[bucket] = peak
+    return peaks
+
+
+class AvailabilityService:
+    def __init__(self, repository: AvailabilityRepository):
+        self.repository = repository
+
+    async def check_many(
+        self, product_ids: Iterable[UUID], start: datetime, end: datetime
+    ) -> dict[UUID, int]:
+        """
+        Free quantity of each product over [start, end), computed in a single query.
+        Unknown and deleted products are left out of the result.
+        """
+        if start >= end:
+            raise InvalidAvailabilityWindow(
+                context={"start": start.isoformat(), "end": end.isoformat()}
+            )
+        return await self.repository.free_quantities(list(set(product_ids)), start, end)
+
+    async def check(self, product_id: UUID, start: datetime, end: datetime) -> int:
+        """Free quantity of a product over [start, end)."""
+        free = await self.check_many([product_id], start, end)
+        return free.get(product_id, 0)
+
+    async def calendar(
+        self,
+        product_id: UUID,
+        start: datetime,
+        end: datetime,
+        granularity: Granularity,
+    ) -> ProductAvailability:
+        """
+        Free quantity of a product for each bucket of the window [start, end),
+        computed from a single query. The last bucket is cut short at `end`.
+        """
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+        width = BUCKET_WIDTHS[granularity]
+        buckets = ceil((end - start) / width)
+        if start >= end or buckets > MAX_BUCKETS:
+            raise InvalidAvailabilityWindow(
+                detail=f"Window must be non-empty and at most {MAX_BUCKETS} buckets",
+                context={
+                    "start": start.isoformat(),
+                    "end": end.isoformat(),
+                    "granularity": granularity.value,
+                },
+            )
+        total_quantity, bookings = await self.repository.get_bookings(
+            product_id, start, end
+        )
+        peaks = peak_load_per_bucket(bookings, start, width, buckets)
+        return ProductAvailability(
+            product_id=product_id,
+            start=start,
+            end=end,
+            granularity=granularity,
+            total_quantity=total_quantity,
+            free=[max(total_quantity - peak, 0) for peak in peaks],
+        )
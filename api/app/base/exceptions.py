@@ -24,3 +24,16 @@ class HTTPException(BaseException):
         self.detail = error.detail
         self.instance = instance
         self.context = error.context
+
+
+class InvalidCursor(BaseException):
+    code = "INVALID_CURSOR"
+    title = "Invalid Cursor"
+
+    def __init__(
+        self,
+        detail: str = "The pagination cursor is malformed",
+        context: Optional[dict[str, Any]] = None,
+        *args: object,
+    ) -> None:
+        super().__init__(detail, context, *args)
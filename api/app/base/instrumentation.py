@@ -0,0 +1,103 @@
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Any, Callable, ClassVar, Optional, TypeVar
+
+from asyncpg.connection import LoggedQuery
+from structlog import get_logger
+
+from app.utils.metrics import HistogramFamily
+
+__all__ = [
+    "QueryLogger",
+    "QueryStats",
+    "instrumented",
+    "query_source",
+    "request_queries",
+]
+
+T = TypeVar("T", bound=type)
+
+# Repository method issuing the current queries, e.g. "OrderRepository.list"
+query_source: ContextVar[Optional[str]] = ContextVar("query_source", default=None)
+
+
+class QueryStats:
+    """Queries issued while serving a request and the time they took."""
+
+    __slots__ = ("count", "elapsed")
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+
+# Set for the duration of a request when the query summary is enabled
+request_queries: ContextVar[Optional[QueryStats]] = ContextVar(
+    "request_queries", default=None
+)
+
+
+def instrumented(cls: T) -> T:
+    """
+    Class decorator tagging the queries of every coroutine method of a
+    repository with `<class>.<method>`.
+    """
+    for name, method in list(vars(cls).items()):
+        if name.startswith("__") or not iscoroutinefunction(method):
+            continue
+        setattr(cls, name, _tagged(f"{cls.__name__}.{name}", method))
+    return cls
+
+
+def _tagged(source: str, method: Callable[..., Any]) -> Callable[..., Any]:
+    @wraps(method)
+    async def wrapper(*args, **kwargs):
+        token = query_source.set(source)
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            query_source.reset(token)
+
+    return wrapper
+
+
+def _shape(value: Any) -> str:
+    """Type (and length of sized values) of a query argument, never its value."""
+    if isinstance(value, (str, bytes, list, tuple, dict)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+class QueryLogger:
+    """
+    asyncpg query logger timing the queries issued by repositories.
+
+    asyncpg runs it right after each query, in a copy of the context of the
+    caller, so the repository tag, the request's `QueryStats` and the structlog
+    context (request ID) of the query are all visible. Untagged queries, like
+    the reset of connections returned to the pool, are only checked against the
+    slow-query threshold.
+    """
+
+    durations: ClassVar[HistogramFamily] = HistogramFamily("source")
+    slow_threshold: ClassVar[float] = 0.2
+
+    @classmethod
+    def log(cls, record: LoggedQuery) -> None:
+        source = query_source.get()
+        if source is not None:
+            cls.durations.observe(record.elapsed, source)
+            stats = request_queries.get()
+            if stats is not None:
+                stats.count += 1
+                stats.elapsed += record.elapsed
+        if record.elapsed >= cls.slow_threshold:
+            get_logger().warning(
+                event="slow_query",
+                source=source,
+                elapsed=round(record.elapsed, 4),
+                query=" ".join(record.query.split())[:1000],
+                params=[_shape(arg) for arg in record.args or ()],
+                error=type(record.exception).__name__ if record.exception else None,
+            )
@@ -0,0 +1,64 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from datetime import datetime
+from typing import Optional, Sequence
+from uuid import UUID
+
+from asyncpg import Record
+from orjson import JSONDecodeError, dumps, loads
+
+from app.base.exceptions import InvalidCursor
+
+__all__ = ["decode_cursor", "encode_cursor", "keyset_condition", "next_page"]
+
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    """Encodes the sort key of the last row of a page into an opaque cursor."""
+    return urlsafe_b64encode(dumps([created_at, id])).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """
+    Decodes a cursor produced by `encode_cursor`.
+
+    Raises:
+        InvalidCursor: If the cursor was not produced by `encode_cursor`
+    """
+    try:
+        created_at, id = loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), UUID(id)
+    except (Base64Error, JSONDecodeError, TypeError, ValueError):
+        raise InvalidCursor(context={"cursor": cursor})
+
+
+def keyset_condition(
+    cursor: str, args: list, created_at: str = "created_at", id: str = "id"
+) -> str:
+    """
+    Condition selecting the rows after `cursor` in `created_at DESC, id DESC`
+    order. The decoded sort key is appended to `args`.
+
+    Args:
+        cursor (str): Cursor of the previous page
+        args (list): Query arguments, extended with the cursor values
+        created_at (str): Column holding the creation time
+        id (str): Column holding the unique identifier
+
+    Returns:
+        str: SQL condition served by an index on (created_at DESC, id DESC)
+    """
+    args.extend(decode_cursor(cursor))
+    return f"({created_at}, {id}) < (${len(args) - 1}, ${len(args)})"
+
+
+def next_page(
+    rows: Sequence[Record], limit: int
+) -> tuple[Sequence[Record], Optional[str]]:
+    """
+    Trims rows fetched with `LIMIT limit + 1` to the page and returns the
+    cursor of the next page, or None if this is the last one.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
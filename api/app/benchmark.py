@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+from time import perf_counter
+
+from argon2 import PasswordHasher
+
+from app.config import Config
+
+PASSWORD = "correct horse battery staple"
+
+# Memory costs (KiB) tried when recommending parameters, strongest first
+MEMORY_COSTS = (262144, 204800, 131072, 65536, 47104, 19456)
+TIME_COSTS = (4, 3, 2, 1)
+
+
+def make_hasher(config: Config, **overrides: int) -> PasswordHasher:
+    parameters = {
+        "time_cost": config.ARGON_TIME_COST,
+        "memory_cost": config.ARGON_MEMORY_COST,
+        "parallelism": config.ARGON_PARALLELISM,
+        "hash_len": config.ARGON_HASH_LENGTH,
+        "salt_len": config.ARGON_SALT_LENGTH,
+    }
+    parameters.update(overrides)
+    return PasswordHasher(**parameters)
+
+
+async def measure(
+    hasher: PasswordHasher, concurrency: int, logins: int, workers: int
+) -> dict[str, float]:
+    """
+    Simulates `concurrency` clients logging in `logins` times in total, verified
+    on a pool of `workers` threads like `Argon2Executor` does.
+
+    Latencies include the time spent waiting for a thread.
+    """
+    loop = asyncio.get_running_loop()
+    hashed = hasher.hash(PASSWORD)
+    latencies: list[float] = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        async def client(count: int) -> None:
+            for _ in range(count):
+                started = perf_counter()
+                await loop.run_in_executor(executor, hasher.verify, hashed, PASSWORD)
+                latencies.append(perf_counter() - started)
+
+        per_client, remainder = divmod(logins, concurrency)
+        started = perf_counter()
+        await asyncio.gather(
+            *(client(per_client + (index < remainder)) for index in range(concurrency))
+        )
+        elapsed = perf_counter() - started
+
+    cuts = quantiles(latencies, n=100, method="inclusive")
+    return {
+        "p50": cuts[49] * 1000,
+        "p95": cuts[94] * 1000,
+        "p99": cuts[98] * 1000,
+        "max": max(latencies) * 1000,
+        "throughput": len(latencies) / elapsed,
+    }
+
+
+def print_result(label: str, result: dict[str, float]) -> None:
+    print(
+        f"{label:<28}"
+        f"p50 {result['p50']:8.1f} ms  p95 {result['p95']:8.1f} ms  "
+        f"p99 {result['p99']:8.1f} ms  max {result['max']:8.1f} ms  "
+        f"{result['throughput']:7.1f} logins/s"
+    )
+
+
+async def run_measure(args: argparse.Namespace, config: Config) -> None:
+    hasher = make_hasher(
+        config,
+        time_cost=args.time_cost or config.ARGON_TIME_COST,
+        memory_cost=args.memory_cost or config.ARGON_MEMORY_COST,
+        parallelism=args.parallelism or config.ARGON_PARALLELISM,
+    )
+    print(
+        f"time_cost={hasher.time_cost} memory_cost={hasher.memory_cost} "
+        f"parallelism={hasher.parallelism} workers={args.workers}"
+    )
+    print_result("single login", await measure(hasher, 1, args.logins, 1))
+    print_result(
+        f"{args.concurrency} concurrent logins",
+        await measure(hasher, args.concurrency, args.logins, args.workers),
+    )
+
+
+async def run_recommend(args: argparse.Namespace, config: Config) -> None:
+    parallelism = args.parallelism or config.ARGON_PARALLELISM
+    print(
+        f"Target: p95 under {args.budget:.0f} ms with {args.concurrency} "
+        f"concurrent logins on {args.workers} threads (parallelism={parallelism})"
+    )
+    best = None
+    for memory_cost in MEMORY_COSTS:
+        for time_cost in TIME_COSTS:
+            hasher = make_hasher(
+                config,
+                time_cost=time_cost,
+                memory_cost=memory_cost,
+                parallelism=parallelism,
+            )
+            result = await measure(hasher, args.concurrency, args.logins, args.workers)
+            print_result(f"m={memory_cost} t={time_cost}", result)
+            if result["p95"] <= args.budget:
+                strength = memory_cost * time_cost
+                if best is None or strength > best[0]:
+                    best = (strength, memory_cost, time_cost, result)
+                # Lower time costs of this memory cost are weaker and faster
+                break
+    if best is None:
+        print("No parameters meet the budget, add workers or raise the budget.")
+        return
+    _, memory_cost, time_cost, result = best
+    print("\nRecommended config.toml values:")
+    print(f"ARGON_TIME_COST = {time_cost}")
+    print(f"ARGON_MEMORY_COST = {memory_cost}")
+    print(f"ARGON_PARALLELISM = {parallelism}")
+    print(f"ARGON_MAX_CONCURRENCY = {args.workers}")
+    print_result("expected", result)
+
+
+async def main():
+    config = Config()
+    parser = argparse.ArgumentParser(
+        description="Benchmark argon2 password hashing on this machine."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    measure_parser = subparsers.add_parser(
+        "measure", help="Measure login latency and throughput."
+    )
+    measure_parser.add_argument("--time-cost", type=int, help="Argon2 time cost.")
+    measure_parser.add_argument(
+        "--memory-cost", type=int, help="Argon2 memory cost in KiB."
+    )
+
+    recommend_parser = subparsers.add_parser(
+        "recommend", help="Recommend the strongest parameters within a budget."
+    )
+    recommend_parser.add_argument(
+        "--budget", type=float, default=250.0, help="p95 login latency budget in ms."
+    )
+
+    for subparser in (measure_parser, recommend_parser):
+        subparser.add_argument("--parallelism", type=int, help="Argon2 parallelism.")
+        subparser.add_argument(
+            "--concurrency", type=int, default=16, help="Concurrent logins."
+        )
+        subparser.add_argument(
+            "--logins", type=int, default=64, help="Logins to measure."
+        )
+        subparser.add_argument(
+            "--workers",
+            type=int,
+            default=config.ARGON_MAX_CONCURRENCY,
+            help="Hashing threads.",
+        )
+
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    # Percentiles need two latencies, and every client at least one login
+    if args.logins < max(2, args.concurrency):
+        parser.error("--logins must be at least 2 and at least --concurrency")
+
+    if args.command == "measure":
+        await run_measure(args, config)
+    elif args.command == "recommend":
+        await run_recommend(args, config)
+
+
+def run_cli():
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    run_cli()
@@ -0,0 +1,177 @@
+import asyncio
+from hashlib import blake2b
+from types import MappingProxyType
+from typing import ClassVar, Iterable, Mapping, Optional
+from uuid import UUID
+
+from structlog import get_logger
+
+from app.categories.exceptions import CategoryNotFound
+from app.categories.models import Category, ListCategory
+from app.categories.repository import CategoryRepository
+from app.database import CacheEntity, InvalidationBus, PgPool
+
+__all__ = ["CategoryCatalog", "CategorySnapshot"]
+
+
+class CategorySnapshot:
+    """
+    Immutable view of the live categories, with the rendered `ListCategory`
+    body and its ETag. The ETag is derived from the body so every worker
+    serving the same categories serves the same ETag.
+    """
+
+    __slots__ = ("version", "categories", "by_id", "body", "etag")
+
+    def __init__(self, version: int, categories: Iterable[Category]):
+        self.version = version
+        self.categories: tuple[Category, ...] = tuple(
+            sorted(categories, key=lambda category: (category.created_at, category.id))
+        )
+        self.by_id: Mapping[UUID, Category] = MappingProxyType(
+            {category.id: category for category in self.categories}
+        )
+        self.body = (
+            ListCategory(categories=list(self.categories)).model_dump_json().encode()
+        )
+        self.etag = f'"{blake2b(self.body, digest_size=16).hexdigest()}"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Whether an `If-None-Match` header names the current body."""
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags
+
+
+# Strong references to running refreshes, see `asyncio.create_task`
+background_tasks: set[asyncio.Task] = set()
+
+
+class CategoryCatalog:
+    """
+    Process-wide snapshot of the live categories.
+
+    Loaded in `lifespan` once the invalidation bus listens, and replaced,
+    never mutated, on every change: a write applies its result to the snapshot
+    of its own worker, and every worker re-reads the category (with its live
+    product count) once the write is published on the invalidation bus.
+    Product writes changing the number of live products of a category publish
+    that category too. Cached models are shared between requests and must not
+    be mutated.
+    """
+
+    snapshot: ClassVar[Optional[CategorySnapshot]] = None
+    _lock: ClassVar[Optional[asyncio.Lock]] = None
+    # Categories whose refresh is scheduled but has not started reading yet
+    _pending: ClassVar[set[UUID]] = set()
+
+    @classmethod
+    def _swap(cls, categories: Iterable[Category]) -> CategorySnapshot:
+        version = cls.snapshot.version + 1 if cls.snapshot is not None else 1
+        cls.snapshot = CategorySnapshot(version, categories)
+        return cls.snapshot
+
+    @classmethod
+    def _get_lock(cls) -> asyncio.Lock:
+        if cls._lock is None:
+            cls._lock = asyncio.Lock()
+        return cls._lock
+
+    @classmethod
+    async def load(cls) -> CategorySnapshot:
+        """Reads every live category, replacing the snapshot."""
+        async with cls._get_lock():
+            cls._pending.clear()
+            async with PgPool.lease() as connection:
+                categories = await CategoryRepository(connection).list()
+            return cls._swap(categories)
+
+    @classmethod
+    async def get(cls) -> CategorySnapshot:
+        """The current snapshot, loaded first if startup could not."""
+        if cls.snapshot is None:
+            return await cls.load()
+        return cls.snapshot
+
+    @classmethod
+    async def refresh(cls, category_id: UUID) -> None:
+        """Re-reads a single category, dropping it once deleted."""
+        async with cls._get_lock():
+            cls._pending.discard(category_id)
+            if cls.snapshot is None:
+                return
+            try:
+                async with PgPool.lease() as connection:
+                    category = await CategoryRepository(connection).get_by_id(
+                        category_id
+                    )
+            except CategoryNotFound:
+                category = None
+            cls._replace(category_id, category)
+
+    @classmethod
+    def _replace(cls, category_id: UUID, category: Optional[Category]) -> None:
+        categories = [
+            existing
+            for existing in cls.snapshot.categories
+            if existing.id != category_id
+        ]
+        if category is not None:
+            categories.append(category)
+        cls._swap(categories)
+
+    @classmethod
+    def put(cls, category: Category) -> Category:
+        """
+        Applies a category just written by this worker, keeping its product
+        count as writes to categories do not return it.
+        """
+        if cls.snapshot is None:
+            return category
+        existing = cls.snapshot.by_id.get(category.id)
+        if existing is not None:
+            category = category.model_copy(
+                update={"active_products": existing.active_products}
+            )
+        cls._replace(category.id, category)
+        return category
+
+    @classmethod
+    def remove(cls, category_id: UUID) -> None:
+        if cls.snapshot is not None and category_id in cls.snapshot.by_id:
+            cls._replace(category_id, None)
+
+    @classmethod
+    def _schedule(cls, category_id: Optional[UUID]) -> None:
+        if category_id is None:
+            task = asyncio.create_task(cls.load())
+        elif category_id in cls._pending:
+            return
+        else:
+            cls._pending.add(category_id)
+            task = asyncio.create_task(cls.refresh(category_id))
+        background_tasks.add(task)
+        task.add_done_callback(_log_failure)
+
+    @classmethod
+    def stats(cls) -> dict[str, int]:
+        snapshot = cls.snapshot
+        return {
+            "version": snapshot.version if snapshot is not None else 0,
+            "size": len(snapshot.categories) if snapshot is not None else 0,
+        }
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        # The snapshot is stale until the next change or reconnection
+        get_logger().error(event="category_refresh_failed", error=str(task.exception()))
+
+
+def _on_category_invalidated(category_id: Optional[str]) -> None:
+    CategoryCatalog._schedule(UUID(category_id) if category_id else None)
+
+
+InvalidationBus.register(CacheEntity.CATEGORY, _on_category_invalidated)
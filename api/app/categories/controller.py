@@ -1,7 +1,7 @@
 from uuid import UUID
 
 import asyncpg
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, Response, status
 
 from app.base.exception_handler import http_exception_handler
 from app.base.exceptions import HTTPException
@@ -9,22 +9,19 @@ from app.categories.exceptions import CategoryAlreadyExists, CategoryNotFound
 from app.categories.models import Category, CreateCategory, ListCategory, UpdateCategory
 from app.categories.repository import CategoryRepository
 from app.categories.service import CategoryService
-from app.database import PgPool
+from app.database import LeasedRoute, PgPool
 from app.users.dependency import RequiresRole
 from app.users.models import UserType
 
-router = APIRouter(prefix="/categories", tags=["categories"])
+router = APIRouter(prefix="/categories", tags=["categories"], route_class=LeasedRoute)
 
 
 async def get_category_service(
     connection: asyncpg.Connection = Depends(PgPool.get_connection),
 ) -> CategoryService:
     """Dependency to get CategoryService with database connection"""
-    try:
-        repository = CategoryRepository(connection)
-        yield CategoryService(repository)
-    finally:
-        await connection.close()
+    repository = CategoryRepository(connection)
+    yield CategoryService(repository)
 
 
 @router.post(
@@ -49,13 +46,26 @@ async def create_category(
         )
 
 
-@router.get("/", response_model=ListCategory)
+@router.get(
+    "/",
+    response_model=ListCategory,
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "Not Modified"}},
+)
 async def get_categories(
+    request: Request,
     service: CategoryService = Depends(get_category_service),
-) -> ListCategory:
-    """Get all categories."""
-    categories = await service.get_categories()
-    return ListCategory(categories=categories)
+) -> Response:
+    """
+    Get all categories. Served from the category snapshot, whose body is
+    rendered once per change and tagged with an ETag for conditional requests.
+    """
+    snapshot = await service.get_categories()
+    headers = {"ETag": snapshot.etag}
+    if snapshot.matches(request.headers.get("if-none-match")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=snapshot.body, media_type="application/json", headers=headers
+    )
 
 
 @router.get("/{category_id}", response_model=Category)
@@ -9,6 +9,9 @@ class Category(BaseModel):
     name: str = Field(..., description="The name of the category")
     description: str = Field(..., description="The description of the category")
     created_at: datetime
+    active_products: int = Field(
+        0, description="The number of live products filed under the category"
+    )
 
 
 class CreateCategory(BaseModel):
@@ -3,10 +3,26 @@ from uuid import UUID
 import asyncpg
 from uuid_utils.compat import uuid7
 
+from app.base.instrumentation import instrumented
 from app.categories.exceptions import CategoryNotFound
 from app.categories.models import Category, CreateCategory, UpdateCategory
+from app.database import CacheEntity, InvalidationBus
 
+# Live categories with the number of live products filed under each, served
+# by the idx_products_category_live partial index
+CATEGORY_WITH_PRODUCTS = """
+SELECT categories.id, categories.name, categories.description,
+       categories.created_at, count(products.id) AS active_products
+FROM categories
+LEFT JOIN products
+  ON products.category_id = categories.id AND products.is_deleted = FALSE
+WHERE categories.is_deleted = FALSE {condition}
+GROUP BY categories.id
+ORDER BY categories.created_at, categories.id
+"""
 
+
+@instrumented
 class CategoryRepository:
     def __init__(self, connection: asyncpg.Connection):
         self.connection = connection
@@ -20,23 +36,16 @@ class CategoryRepository:
         row = await self.connection.fetchrow(
             query, uuid7(), category.name, category.description
         )
+        await InvalidationBus.publish(self.connection, CacheEntity.CATEGORY, row["id"])
         return Category(**row)
 
     async def list(self) -> list[Category]:
-        query = """
-        SELECT id, name, description, created_at
-        FROM categories
-        WHERE is_deleted=FALSE;
-        """
+        query = CATEGORY_WITH_PRODUCTS.format(condition="")
         rows = await self.connection.fetch(query)
         return [Category(**row) for row in rows]
 
     async def get_by_id(self, category_id: UUID) -> Category:
-        query = """
-        SELECT id, name, description, created_at
-        FROM categories
-        WHERE id = $1 AND is_deleted = FALSE;
-        """
+        query = CATEGORY_WITH_PRODUCTS.format(condition="AND categories.id = $1")
         row = await self.connection.fetchrow(query, category_id)
         if row:
             return Category(**row)
@@ -53,6 +62,7 @@ class CategoryRepository:
             query, id, category.name, category.description
         )
         if row:
+            await InvalidationBus.publish(self.connection, CacheEntity.CATEGORY, id)
             return Category(**row)
         raise CategoryNotFound(context={"category_id": id})
 
@@ -65,3 +75,6 @@ class CategoryRepository:
         result = await self.connection.execute(query, category_id)
         if result == "UPDATE 0":
             raise CategoryNotFound(context={"category_id": category_id})
+        await InvalidationBus.publish(
+            self.connection, CacheEntity.CATEGORY, category_id
+        )
@@ -1,5 +1,7 @@
 from uuid import UUID
 
+from app.categories.catalog import CategoryCatalog, CategorySnapshot
+from app.categories.exceptions import CategoryNotFound
 from app.categories.models import Category, CreateCategory, UpdateCategory
 from app.categories.repository import CategoryRepository
 
@@ -11,22 +13,29 @@ class CategoryService:
     async def create_category(self, category_data: CreateCategory) -> Category:
         """Create a new category."""
         # TODO: Add validation for duplicate names if needed
-        return await self.repository.create(category_data)
+        category = await self.repository.create(category_data)
+        return CategoryCatalog.put(category)
 
-    async def get_categories(self) -> list[Category]:
-        """Get all categories."""
-        return await self.repository.list()
+    async def get_categories(self) -> CategorySnapshot:
+        """Get all categories, from the category snapshot."""
+        return await CategoryCatalog.get()
 
     async def get_category(self, category_id: UUID) -> Category:
-        """Get a category by ID."""
-        return await self.repository.get_by_id(category_id)
+        """Get a category by ID, from the category snapshot."""
+        snapshot = await CategoryCatalog.get()
+        category = snapshot.by_id.get(category_id)
+        if category is None:
+            raise CategoryNotFound(context={"category_id": str(category_id)})
+        return category
 
     async def update_category(
         self, category_id: UUID, category_data: UpdateCategory
     ) -> Category:
         """Update an existing category."""
-        return await self.repository.update(category_id, category_data)
+        category = await self.repository.update(category_id, category_data)
+        return CategoryCatalog.put(category)
 
     async def delete_category(self, category_id: UUID) -> None:
         """Soft delete a category."""
         await self.repository.delete(category_id)
+        CategoryCatalog.remove(category_id)
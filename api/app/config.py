@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 
 from app.base.config import BaseConfig
 
@@ -14,14 +14,44 @@ class Config(BaseConfig):
     POSTGRES_DB: str
     POSTGRES_MIN_CONNECTIONS: int = 2
     POSTGRES_MAX_CONNECTIONS: int = 2
+    POSTGRES_ACQUIRE_TIMEOUT: float = 5.0
+    POSTGRES_MAX_WAITERS: int = 100
+    POSTGRES_LEAK_THRESHOLD: float = 30.0
+    POSTGRES_SLOW_QUERY_THRESHOLD: float = 0.2
+    POSTGRES_QUERY_SUMMARY: bool = False
     SENTRY_URL: str
+    SENTRY_TRACES_SAMPLE_RATE: float = 1.0
+    SENTRY_TRACES_ROUTE_RATES: dict[str, float] = {}
+    SENTRY_SLOW_TRANSACTION: float = 1.0
+    SENTRY_IGNORED_PATHS: list[str] = ["/", "/metrics"]
+    SENTRY_PROFILE_SESSION_SAMPLE_RATE: float = 1.0
+    LOG_FILE: str = "./logs.json"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_BATCH_SIZE: int = 256
+    LOG_FLUSH_INTERVAL: float = 1.0
+    LOG_MAX_BYTES: int = 100 * 1024 * 1024
+    LOG_BACKUP_COUNT: int = 5
+    METRICS_DIR: str = "./.metrics"
+    METRICS_INTERVAL: float = 5.0
     ARGON_TIME_COST: int
     ARGON_MEMORY_COST: int
     ARGON_PARALLELISM: int
     ARGON_SALT_LENGTH: int
     ARGON_HASH_LENGTH: int
+    ARGON_MAX_CONCURRENCY: int = 4
+    ARGON_MAX_QUEUE: int = 64
     PASETO_KEY: str
     PASETO_EXP: int = 900
+    TOKEN_CACHE_SIZE: int = 10000
+    PRODUCT_CACHE_SIZE: int = 10000
+    PRODUCT_CACHE_TTL: float = 30.0
+    PINCODE_CACHE_SIZE: int = 10000
+    PINCODE_CACHE_TTL: float = 300.0
+    DELIVERY_ASSIGNMENT_STRATEGY: Literal["first_match", "least_loaded"] = (
+        "least_loaded"
+    )
+    DELIVERY_PARTNER_DAILY_CAPACITY: int = 20
+    DELIVERY_TIMEZONE: str = "Asia/Kolkata"
     MINIO_ADDRESS: str
     MINIO_ACCESS_KEY: str
     MINIO_SECRET_KEY: str
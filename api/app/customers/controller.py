@@ -8,21 +8,18 @@ from app.base.exceptions import HTTPException
 from app.customers.exceptions import CustomerAlreadyExists, CustomerNotFound
 from app.customers.models import CreateCustomer, Customer, ListCustomer, UpdateCustomer
 from app.customers.service import CustomerService
-from app.database import PgPool
+from app.database import LeasedRoute, PgPool
 from app.users.dependency import RequiresRole
 from app.users.models import UserType
 
-router = APIRouter(prefix="/customers", tags=["customers"])
+router = APIRouter(prefix="/customers", tags=["customers"], route_class=LeasedRoute)
 
 
 async def get_customer_service(
     connection: asyncpg.Connection = Depends(PgPool.get_connection),
 ) -> CustomerService:
     """Dependency to get CustomerService with database connection"""
-    try:
-        yield CustomerService(connection)
-    finally:
-        await connection.close()
+    yield CustomerService(connection)
 
 
 @router.post("/", response_model=Customer, status_code=status.HTTP_201_CREATED)
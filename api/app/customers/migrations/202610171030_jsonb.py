@@ -0,0 +1,23 @@
+# List of dependencies (migration that must be applied before this one)
+dependencies = ["customers.202508110629_initial"]
+
+# SQL to apply the migration
+# Documents were stored as JSON strings holding the serialized document, they
+# are unwrapped while converting the columns to JSONB.
+apply = [
+    """--sql
+    ALTER TABLE customers
+        ALTER COLUMN address TYPE JSONB USING CASE
+            WHEN json_typeof(address) = 'string' THEN (address #>> '{}')::jsonb
+            ELSE address::jsonb
+        END;
+    """,
+]
+
+# SQL to rollback the migration
+rollback = [
+    """--sql
+    ALTER TABLE customers
+        ALTER COLUMN address TYPE JSON USING to_json(address::text);
+    """,
+]
@@ -2,10 +2,17 @@ from uuid import UUID
 
 import asyncpg
 
+from app.base.instrumentation import instrumented
 from app.customers.exceptions import CustomerAlreadyExists, CustomerNotFound
-from app.customers.models import Addresses, CreateCustomer, Customer, UpdateCustomer
+from app.customers.models import CreateCustomer, Customer, UpdateCustomer
+from app.database import CacheEntity, InvalidationBus
+from app.delivery_partner.repository import (
+    DELETED_PARTNER_PINCODE,
+    drop_pincode_partners,
+)
 
 
+@instrumented
 class CustomerRepository:
     def __init__(self, connection: asyncpg.Connection):
         self.connection = connection
@@ -21,17 +28,10 @@ class CustomerRepository:
                 query,
                 customer.id,
                 customer.name,
-                customer.address.model_dump_json(),
+                customer.address,
                 customer.loyalty_points,
             )
-            return Customer(
-                id=row["id"],
-                name=row["name"],
-                address=Addresses.model_validate_json(row["address"]),
-                loyalty_points=row["loyalty_points"],
-                is_deleted=row["is_deleted"],
-                created_at=row["created_at"],
-            )
+            return Customer.model_validate(dict(row))
         except asyncpg.UniqueViolationError:
             raise CustomerAlreadyExists(context={"customer_id": str(customer.id)})
         except asyncpg.ForeignKeyViolationError:
@@ -49,17 +49,7 @@ class CustomerRepository:
         WHERE is_deleted = FALSE
         """
         rows = await self.connection.fetch(query)
-        return [
-            Customer(
-                id=row["id"],
-                name=row["name"],
-                address=Addresses.model_validate_json(row["address"]),
-                loyalty_points=row["loyalty_points"],
-                is_deleted=row["is_deleted"],
-                created_at=row["created_at"],
-            )
-            for row in rows
-        ]
+        return [Customer.model_validate(dict(row)) for row in rows]
 
     async def get_by_id(self, customer_id: UUID) -> Customer:
         query = """
@@ -69,14 +59,7 @@ class CustomerRepository:
         """
         row = await self.connection.fetchrow(query, customer_id)
         if row:
-            return Customer(
-                id=row["id"],
-                name=row["name"],
-                address=Addresses.model_validate_json(row["address"]),
-                loyalty_points=row["loyalty_points"],
-                is_deleted=row["is_deleted"],
-                created_at=row["created_at"],
-            )
+            return Customer.model_validate(dict(row))
         raise CustomerNotFound(context={"customer_id": str(customer_id)})
 
     async def update(self, id: UUID, customer: UpdateCustomer) -> Customer:
@@ -90,26 +73,24 @@ class CustomerRepository:
             query,
             id,
             customer.name,
-            customer.address.model_dump_json(),
+            customer.address,
             customer.loyalty_points,
         )
         if row:
-            return Customer(
-                id=row["id"],
-                name=row["name"],
-                address=Addresses.model_validate_json(row["address"]),
-                loyalty_points=row["loyalty_points"],
-                is_deleted=row["is_deleted"],
-                created_at=row["created_at"],
-            )
+            return Customer.model_validate(dict(row))
         raise CustomerNotFound(context={"customer_id": str(id)})
 
     async def delete(self, customer_id: UUID) -> None:
-        query = """
+        query = f"""
         UPDATE users
         SET is_deleted = TRUE
         WHERE id = $1
+        RETURNING {DELETED_PARTNER_PINCODE}
         """
-        result = await self.connection.execute(query, customer_id)
-        if result == "UPDATE 0":
+        row = await self.connection.fetchrow(query, customer_id)
+        if row is None:
             raise CustomerNotFound(context={"customer_id": str(customer_id)})
+        await InvalidationBus.publish(
+            self.connection, CacheEntity.USER_TOKENS, customer_id
+        )
+        await drop_pincode_partners(self.connection, row["partner_pincode"])
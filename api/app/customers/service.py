@@ -4,6 +4,7 @@ import asyncpg
 
 from app.customers.models import CreateCustomer, Customer, UpdateCustomer
 from app.customers.repository import CustomerRepository
+from app.users.dependency import revoke_tokens
 
 
 class CustomerService:
@@ -34,6 +35,7 @@ class CustomerService:
     async def delete_customer(self, customer_id: UUID) -> None:
         """Soft delete a customer."""
         await self.repository.delete(customer_id)
+        revoke_tokens(customer_id)
 
     async def add_loyalty_points(self, customer_id: UUID, points: int) -> Customer:
         """Add loyalty points to a customer."""
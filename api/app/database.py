@@ -1,24 +1,121 @@
-from json import dumps, loads
-from typing import ClassVar, Optional
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from enum import Enum
+from functools import wraps
+from time import monotonic, perf_counter, time
+from typing import Any, AsyncIterator, Callable, ClassVar, Optional
 
-from asyncpg import Pool, create_pool
+from asyncpg import Connection, Pool, connect, create_pool
+from fastapi import status
+from fastapi.routing import APIRoute
+from orjson import OPT_NON_STR_KEYS, dumps, loads
+from pydantic import BaseModel
+from structlog import get_logger
+from structlog.contextvars import get_contextvars
+
+from app.base.exception_handler import http_exception_handler
+from app.base.exceptions import BaseException, HTTPException
+from app.base.instrumentation import QueryLogger
+from app.utils.metrics import Histogram
 
 from .config import Config
 
 
+class PoolExhausted(BaseException):
+    code = "DATABASE_POOL_EXHAUSTED"
+    title = "Database Pool Exhausted"
+
+    def __init__(
+        self,
+        detail: str = "Too many requests are waiting for a database connection",
+        context: Optional[dict[str, Any]] = None,
+        *args: object,
+    ) -> None:
+        super().__init__(detail, context, *args)
+
+
+class PoolTimeout(BaseException):
+    code = "DATABASE_POOL_TIMEOUT"
+    title = "Database Pool Timeout"
+
+    def __init__(
+        self,
+        detail: str = "Timed out waiting for a database connection",
+        context: Optional[dict[str, Any]] = None,
+        *args: object,
+    ) -> None:
+        super().__init__(detail, context, *args)
+
+
+def _serialize(value: Any) -> Any:
+    """Serializes values orjson does not support natively, e.g. pydantic models."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def encode_jsonb(value: Any) -> bytes:
+    """Encodes a document in the binary JSONB format (version 1)."""
+    return b"\x01" + dumps(value, default=_serialize, option=OPT_NON_STR_KEYS)
+
+
+def decode_jsonb(data: bytes) -> Any:
+    """Decodes a document in the binary JSONB format (version 1)."""
+    return loads(memoryview(data)[1:])
+
+
+# Lazy connections handed out while serving the current request
+_request_connections: ContextVar[Optional[list["LazyConnection"]]] = ContextVar(
+    "request_connections", default=None
+)
+
+
+class Lease:
+    """Book-keeping for a connection currently checked out of the pool."""
+
+    __slots__ = ("acquired_at", "request_id", "reported")
+
+    def __init__(self, request_id: Optional[str]):
+        self.acquired_at = monotonic()
+        self.request_id = request_id
+        self.reported = False
+
+
 class PgPool:
     pool: ClassVar[Optional[Pool]] = None
+    leases: ClassVar[dict[int, Lease]] = {}
+    waiters: ClassVar[int] = 0
+    acquire_latency: ClassVar[Histogram] = Histogram()
+    acquire_timeout: ClassVar[float] = 5.0
+    max_waiters: ClassVar[int] = 100
+    leak_threshold: ClassVar[float] = 30.0
+    _leak_detector: ClassVar[Optional[asyncio.Task]] = None
 
     @classmethod
     async def initiate(cls) -> None:
         if cls.pool is not None:
             return
         config = Config()
+        cls.acquire_timeout = config.POSTGRES_ACQUIRE_TIMEOUT
+        cls.max_waiters = config.POSTGRES_MAX_WAITERS
+        cls.leak_threshold = config.POSTGRES_LEAK_THRESHOLD
+        QueryLogger.slow_threshold = config.POSTGRES_SLOW_QUERY_THRESHOLD
 
         async def init_connection(connection):
+            connection.add_query_logger(QueryLogger.log)
+            await connection.set_type_codec(
+                "jsonb",
+                encoder=encode_jsonb,
+                decoder=decode_jsonb,
+                schema="pg_catalog",
+                format="binary",
+            )
             await connection.set_type_codec(
                 "json",
-                encoder=dumps,
+                encoder=lambda value: dumps(
+                    value, default=_serialize, option=OPT_NON_STR_KEYS
+                ).decode(),
                 decoder=loads,
                 schema="pg_catalog",
             )
@@ -33,20 +130,396 @@ class PgPool:
             max_size=config.POSTGRES_MAX_CONNECTIONS,
             init=init_connection,
         )
+        cls._leak_detector = asyncio.create_task(cls._detect_leaks())
 
     @classmethod
-    async def get_connection(cls):
+    async def acquire(cls) -> Connection:
+        """
+        Checks a connection out of the pool.
+
+        Raises:
+            PoolExhausted: If every connection is in use and the wait queue is full
+            PoolTimeout: If no connection became free within the acquire timeout
+        """
         if cls.pool is None:
             raise Exception("Pool not initiated")
+        if len(cls.leases) >= cls.pool.get_max_size() and (
+            cls.waiters >= cls.max_waiters
+        ):
+            raise PoolExhausted(context={"waiters": cls.waiters})
+        cls.waiters += 1
+        started = perf_counter()
         try:
-            client = await cls.pool.acquire()
-            yield client
-        except Exception:
-            await cls.pool.release(client)
-            raise
+            connection = await cls.pool.acquire(timeout=cls.acquire_timeout)
+        except TimeoutError:
+            raise PoolTimeout(context={"timeout": cls.acquire_timeout})
+        finally:
+            cls.waiters -= 1
+        cls.acquire_latency.observe(perf_counter() - started)
+        cls.leases[id(connection)] = Lease(get_contextvars().get("request_id"))
+        return connection
+
+    @classmethod
+    async def release(cls, connection: Connection) -> None:
+        """Returns a connection checked out with `acquire` back to the pool."""
+        lease = cls.leases.pop(id(connection), None)
+        if lease is not None and lease.reported:
+            get_logger().info(
+                event="connection_lease_returned",
+                held_for=round(monotonic() - lease.acquired_at, 3),
+                request_id=lease.request_id,
+            )
+        await cls.pool.release(connection)
+
+    @classmethod
+    @asynccontextmanager
+    async def lease(cls) -> AsyncIterator[Connection]:
+        """Context manager holding a pooled connection for the duration of the block."""
+        connection = await cls.acquire()
+        try:
+            yield connection
+        finally:
+            await cls.release(connection)
+
+    @classmethod
+    async def get_connection(cls):
+        """
+        Dependency providing a `LazyConnection`.
+
+        Nothing is taken from the pool until the first query, so authentication
+        and validation failures never hold a connection. Routes using
+        `LeasedRoute` hand the connection back as soon as the endpoint returns.
+        """
+        connection = LazyConnection()
+        connections = _request_connections.get()
+        if connections is None:
+            connections = []
+            _request_connections.set(connections)
+        connections.append(connection)
+        try:
+            yield connection
+        finally:
+            await connection.release()
+
+    @classmethod
+    def stats(cls) -> dict[str, Any]:
+        """Live statistics of the pool and the connections leased from it."""
+        if cls.pool is None:
+            return {}
+        return {
+            "size": cls.pool.get_size(),
+            "max_size": cls.pool.get_max_size(),
+            "in_use": len(cls.leases),
+            "idle": cls.pool.get_idle_size(),
+            "waiters": cls.waiters,
+            "acquire_latency": cls.acquire_latency.snapshot(),
+        }
+
+    @classmethod
+    async def _detect_leaks(cls) -> None:
+        """Periodically reports leases held for longer than the leak threshold."""
+        logger = get_logger()
+        while True:
+            await asyncio.sleep(cls.leak_threshold / 2)
+            now = monotonic()
+            for lease in list(cls.leases.values()):
+                held_for = now - lease.acquired_at
+                if held_for > cls.leak_threshold and not lease.reported:
+                    lease.reported = True
+                    logger.warning(
+                        event="connection_lease_leaked",
+                        held_for=round(held_for, 3),
+                        request_id=lease.request_id,
+                    )
 
     @classmethod
     async def close(cls):
         if cls.pool is None:
             return
+        if cls._leak_detector is not None:
+            cls._leak_detector.cancel()
+            cls._leak_detector = None
         await cls.pool.close()
+        cls.pool = None
+        cls.leases.clear()
+
+
+class CacheEntity(str, Enum):
+    """Entities whose in-process caches are invalidated through the bus."""
+
+    PRODUCT = "product"
+    CATEGORY = "category"
+    PINCODE_PARTNERS = "pincode_partners"
+    USER_TOKENS = "user_tokens"
+
+
+# Called with the id of the changed entity, or None when the whole cache must
+# be flushed as changes may have been missed
+InvalidationHandler = Callable[[Optional[str]], None]
+
+
+class InvalidationBus:
+    """
+    Propagates cache invalidations to every worker over Postgres LISTEN/NOTIFY.
+
+    Repositories publish on the connection of their write, so Postgres only
+    delivers the message once the transaction commits, and never if it rolls
+    back. Each worker listens on a dedicated connection and calls the handlers
+    caches registered for the entity, including for its own writes. Whenever
+    the listening connection is re-established, every cache is flushed since
+    messages sent while it was down are lost. The first connection only
+    flushes when caches may have been filled before it, see `wait_listening`.
+    """
+
+    channel: ClassVar[str] = "cache_invalidation"
+    keepalive: ClassVar[float] = 10.0
+    handlers: ClassVar[dict[CacheEntity, list[InvalidationHandler]]] = {}
+    connected: ClassVar[bool] = False
+    published: ClassVar[int] = 0
+    received: ClassVar[int] = 0
+    reconnects: ClassVar[int] = 0
+    lag: ClassVar[Histogram] = Histogram()
+    _listener: ClassVar[Optional[asyncio.Task]] = None
+    _listening: ClassVar[Optional[asyncio.Event]] = None
+    # Whether caches may hold entries read while nobody was listening
+    _flush_on_connect: ClassVar[bool] = False
+
+    @classmethod
+    def register(cls, entity: CacheEntity, handler: InvalidationHandler) -> None:
+        cls.handlers.setdefault(entity, []).append(handler)
+
+    @classmethod
+    async def publish(
+        cls, connection: "Connection | LazyConnection", entity: CacheEntity, id: Any
+    ) -> None:
+        """Notifies every worker that an entity changed, once committed."""
+        payload = dumps({"entity": entity.value, "id": str(id), "sent_at": time()})
+        await connection.execute(
+            "SELECT pg_notify($1, $2)", cls.channel, payload.decode()
+        )
+        cls.published += 1
+
+    @classmethod
+    def _receive(cls, connection: Connection, pid: int, channel: str, payload: str):
+        try:
+            message = loads(payload)
+            entity = CacheEntity(message["entity"])
+        except (ValueError, KeyError):
+            get_logger().warning(event="invalidation_malformed", payload=payload)
+            return
+        cls.received += 1
+        cls.lag.observe(max(time() - message.get("sent_at", time()), 0.0))
+        cls._dispatch(entity, message.get("id"))
+
+    @classmethod
+    def _dispatch(cls, entity: CacheEntity, id: Optional[str]) -> None:
+        for handler in cls.handlers.get(entity, ()):
+            try:
+                handler(id)
+            except Exception as e:
+                get_logger().error(
+                    event="invalidation_handler_failed",
+                    entity=entity.value,
+                    id=id,
+                    error=str(e),
+                )
+
+    @classmethod
+    def flush(cls) -> None:
+        """Flushes every registered cache."""
+        for entity in cls.handlers:
+            cls._dispatch(entity, None)
+
+    @classmethod
+    def start(cls) -> None:
+        if cls._listener is None:
+            cls._listening = asyncio.Event()
+            cls._listener = asyncio.create_task(cls._listen())
+            cls._listener.add_done_callback(cls._listener_done)
+
+    @classmethod
+    async def wait_listening(cls, timeout: float) -> bool:
+        """
+        Waits for the first listening connection, called on startup before
+        filling caches so they do not need to be flushed once it is up.
+        """
+        try:
+            await asyncio.wait_for(cls._listening.wait(), timeout)
+            return True
+        except TimeoutError:
+            get_logger().warning(event="invalidation_listener_not_ready")
+            cls._flush_on_connect = True
+            return False
+
+    @classmethod
+    def _listener_done(cls, task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+        # _listen only returns when cancelled, caches are stale from now on
+        get_logger().error(
+            event="invalidation_listener_stopped",
+            error=repr(task.exception()) if task.exception() else None,
+        )
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._listener is not None:
+            cls._listener.cancel()
+            try:
+                await cls._listener
+            except asyncio.CancelledError:
+                pass
+            cls._listener = None
+
+    @classmethod
+    async def _listen(cls) -> None:
+        """Keeps a listening connection open, reconnecting with a backoff."""
+        config = Config()
+        logger = get_logger()
+        delay = 1.0
+        while True:
+            try:
+                connection = await connect(
+                    user=config.POSTGRES_USERNAME,
+                    password=config.POSTGRES_PWD,
+                    database=config.POSTGRES_DB,
+                    host=config.POSTGRES_HOST_ADDRESS,
+                    port=config.POSTGRES_PORT,
+                )
+            except Exception as e:
+                logger.warning(event="invalidation_connect_failed", error=repr(e))
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            try:
+                await connection.add_listener(cls.channel, cls._receive)
+                cls.connected = True
+                delay = 1.0
+                if cls._flush_on_connect:
+                    cls.flush()
+                cls._flush_on_connect = True
+                cls._listening.set()
+                # Notifications only arrive while the connection is healthy
+                while True:
+                    await asyncio.sleep(cls.keepalive)
+                    await connection.execute("SELECT 1", timeout=cls.keepalive)
+            except Exception as e:
+                logger.warning(event="invalidation_connection_lost", error=repr(e))
+            finally:
+                cls.connected = False
+                connection.terminate()
+            cls.reconnects += 1
+            cls.flush()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    @classmethod
+    def stats(cls) -> dict[str, Any]:
+        return {
+            "connected": cls.connected,
+            "published": cls.published,
+            "received": cls.received,
+            "reconnects": cls.reconnects,
+            "lag": cls.lag.snapshot(),
+        }
+
+
+class LazyTransaction:
+    """Transaction of a `LazyConnection`, acquiring the connection on enter."""
+
+    __slots__ = ("_handle", "_kwargs", "_transaction")
+
+    def __init__(self, handle: "LazyConnection", kwargs: dict[str, Any]):
+        self._handle = handle
+        self._kwargs = kwargs
+        self._transaction = None
+
+    async def __aenter__(self):
+        connection = await self._handle.acquire()
+        self._transaction = connection.transaction(**self._kwargs)
+        return await self._transaction.__aenter__()
+
+    async def __aexit__(self, *exc_info):
+        return await self._transaction.__aexit__(*exc_info)
+
+
+class LazyConnection:
+    """
+    Connection handle exposing the query API of `asyncpg.Connection` which only
+    checks a connection out of the pool when the first query is issued.
+    """
+
+    __slots__ = ("_connection",)
+
+    def __init__(self):
+        self._connection: Optional[Connection] = None
+
+    async def acquire(self) -> Connection:
+        if self._connection is None:
+            self._connection = await PgPool.acquire()
+        return self._connection
+
+    async def execute(self, query: str, *args, **kwargs):
+        connection = await self.acquire()
+        return await connection.execute(query, *args, **kwargs)
+
+    async def executemany(self, command: str, args, **kwargs):
+        connection = await self.acquire()
+        return await connection.executemany(command, args, **kwargs)
+
+    async def fetch(self, query: str, *args, **kwargs):
+        connection = await self.acquire()
+        return await connection.fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query: str, *args, **kwargs):
+        connection = await self.acquire()
+        return await connection.fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query: str, *args, **kwargs):
+        connection = await self.acquire()
+        return await connection.fetchval(query, *args, **kwargs)
+
+    def transaction(self, **kwargs) -> LazyTransaction:
+        return LazyTransaction(self, kwargs)
+
+    async def release(self) -> None:
+        """Returns the underlying connection to the pool, if one was acquired."""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await PgPool.release(connection)
+
+
+def release_connections_after(endpoint: Callable) -> Callable:
+    """
+    Wraps an endpoint so the lazy connections of the request are released as
+    soon as it returns, before FastAPI serializes the response.
+    """
+
+    @wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        except (PoolExhausted, PoolTimeout) as e:
+            return http_exception_handler(
+                HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    error=e,
+                )
+            )
+        finally:
+            connections = _request_connections.get()
+            if connections:
+                for connection in connections:
+                    await connection.release()
+                connections.clear()
+
+    return wrapper
+
+
+class LeasedRoute(APIRoute):
+    """APIRoute releasing the request's database connections right after the endpoint."""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        if asyncio.iscoroutinefunction(endpoint):
+            endpoint = release_connections_after(endpoint)
+        super().__init__(path, endpoint, **kwargs)
@@ -0,0 +1,134 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, time, timedelta, timezone
+from functools import cache
+from typing import Callable, Optional
+from uuid import UUID
+from zoneinfo import ZoneInfo
+
+from app.config import Config
+from app.deliveries.models import DeliveryType
+from app.deliveries.repository import DeliveryRepository
+
+__all__ = [
+    "AssignmentStrategy",
+    "DeliveryLeg",
+    "FirstMatchStrategy",
+    "LeastLoadedStrategy",
+    "get_assignment_strategy",
+]
+
+
+class DeliveryLeg:
+    """A drop or pickup of an order and the partners serving its pincode."""
+
+    __slots__ = ("delivery_type", "scheduled_at", "candidates")
+
+    def __init__(
+        self,
+        delivery_type: DeliveryType,
+        scheduled_at: datetime,
+        candidates: tuple[UUID, ...],
+    ):
+        self.delivery_type = delivery_type
+        self.scheduled_at = scheduled_at
+        self.candidates = candidates
+
+
+class AssignmentStrategy(ABC):
+    """Chooses the delivery partner of each leg of an order."""
+
+    @abstractmethod
+    async def choose(
+        self, repository: DeliveryRepository, order_id: UUID, legs: list[DeliveryLeg]
+    ) -> list[Optional[UUID]]:
+        """Partner of each leg, None for legs no candidate can take."""
+
+
+class FirstMatchStrategy(AssignmentStrategy):
+    """Gives every leg to the first partner serving its pincode."""
+
+    async def choose(
+        self, repository: DeliveryRepository, order_id: UUID, legs: list[DeliveryLeg]
+    ) -> list[Optional[UUID]]:
+        return [leg.candidates[0] if leg.candidates else None for leg in legs]
+
+
+class LeastLoadedStrategy(AssignmentStrategy):
+    """
+    Gives every leg to the partner with the fewest open deliveries on the day
+    it is scheduled, skipping partners which reached `capacity` that day.
+
+    Ties go to the partner whose id is closest to the order id (by XOR), which
+    is stable for an order but spreads the orders of a quiet day over every
+    partner. Loads are read without locking, so confirmations racing for the
+    last slot of a partner may exceed the capacity by a delivery each.
+    """
+
+    def __init__(self, capacity: int, timezone: ZoneInfo):
+        self.capacity = capacity
+        self.timezone = timezone
+
+    def _day(self, scheduled_at: datetime) -> tuple[datetime, datetime]:
+        """Local day holding a scheduled time, as [start, end)."""
+        # Naive times are UTC, like the timestamps stored by the database
+        if scheduled_at.tzinfo is None:
+            scheduled_at = scheduled_at.replace(tzinfo=timezone.utc)
+        day = scheduled_at.astimezone(self.timezone).date()
+        return (
+            datetime.combine(day, time(), self.timezone),
+            datetime.combine(day + timedelta(days=1), time(), self.timezone),
+        )
+
+    async def choose(
+        self, repository: DeliveryRepository, order_id: UUID, legs: list[DeliveryLeg]
+    ) -> list[Optional[UUID]]:
+        days = [self._day(leg.scheduled_at) for leg in legs]
+        slots = [
+            (partner_id, *day)
+            for leg, day in zip(legs, days)
+            for partner_id in leg.candidates
+        ]
+        loads = await repository.partner_loads(slots) if slots else []
+        # Both legs may fall on the same day, the first one then counts
+        # towards the load seen by the second
+        load_by_slot = {
+            (partner_id, start): load
+            for (partner_id, start, _), load in zip(slots, loads)
+        }
+
+        chosen = []
+        for leg, (start, _) in zip(legs, days):
+            available = [
+                partner_id
+                for partner_id in leg.candidates
+                if load_by_slot[(partner_id, start)] < self.capacity
+            ]
+            if not available:
+                chosen.append(None)
+                continue
+            partner_id = min(
+                available,
+                key=lambda partner_id: (
+                    load_by_slot[(partner_id, start)],
+                    partner_id.int ^ order_id.int,
+                ),
+            )
+            load_by_slot[(partner_id, start)] += 1
+            chosen.append(partner_id)
+        return chosen
+
+
+# Strategies by their DELIVERY_ASSIGNMENT_STRATEGY name
+STRATEGIES: dict[str, Callable[[Config], AssignmentStrategy]] = {
+    "first_match": lambda config: FirstMatchStrategy(),
+    "least_loaded": lambda config: LeastLoadedStrategy(
+        config.DELIVERY_PARTNER_DAILY_CAPACITY, ZoneInfo(config.DELIVERY_TIMEZONE)
+    ),
+}
+
+
+@cache
+def get_assignment_strategy() -> AssignmentStrategy:
+    """The configured strategy, first built in `lifespan`."""
+    config = Config()
+    return STRATEGIES[config.DELIVERY_ASSIGNMENT_STRATEGY](config)
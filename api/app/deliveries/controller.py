@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, status
 
 from app.base.exception_handler import http_exception_handler
 from app.base.exceptions import HTTPException
-from app.database import PgPool
+from app.database import LeasedRoute, PgPool
 from app.deliveries.exceptions import DeliveryNotFound, InvalidDeliveryRating
 from app.deliveries.models import Delivery, ListDelivery, UpdateDelivery
 from app.deliveries.repository import DeliveryRepository
@@ -13,18 +13,15 @@ from app.deliveries.service import DeliveryService
 from app.users.dependency import RequiresRole, get_current_user
 from app.users.models import UserType
 
-router = APIRouter(prefix="/deliveries", tags=["deliveries"])
+router = APIRouter(prefix="/deliveries", tags=["deliveries"], route_class=LeasedRoute)
 
 
 async def get_delivery_service(
     connection: asyncpg.Connection = Depends(PgPool.get_connection),
 ) -> DeliveryService:
     """Dependency to get DeliveryService with database connection"""
-    try:
-        repository = DeliveryRepository(connection)
-        yield DeliveryService(repository)
-    finally:
-        await connection.close()
+    repository = DeliveryRepository(connection)
+    yield DeliveryService(repository)
 
 
 # @router.post("/", response_model=Delivery, status_code=status.HTTP_201_CREATED)
@@ -1,8 +1,11 @@
+from datetime import datetime
+from typing import List
 from uuid import UUID
 
 import asyncpg
 from uuid_utils.compat import uuid7
 
+from app.base.instrumentation import instrumented
 from app.deliveries.exceptions import (
     DeliveryNotFound,
     DeliveryPartnerNotFound,
@@ -12,6 +15,7 @@ from app.deliveries.exceptions import (
 from app.deliveries.models import CreateDelivery, Delivery, UpdateDelivery
 
 
+@instrumented
 class DeliveryRepository:
     def __init__(self, connection: asyncpg.Connection):
         self.connection = connection
@@ -90,3 +94,58 @@ class DeliveryRepository:
         if row:
             return Delivery(**row)
         raise DeliveryNotFound(context={"delivery_id": str(delivery_id)})
+
+    async def partner_loads(
+        self, slots: List[tuple[UUID, datetime, datetime]]
+    ) -> List[int]:
+        """
+        Open deliveries of each (partner, window start, window end) slot: drops
+        of confirmed or shipped orders delivered in the window and pickups of
+        orders not yet picked up collected in it. Loads are aggregated once per
+        distinct window from the orders scheduled in it, through the partial
+        indexes of the open orders, and returned in the order of `slots`.
+        """
+        query = """
+        WITH slot AS (
+            SELECT *
+            FROM unnest($1::uuid[], $2::timestamptz[], $3::timestamptz[])
+                WITH ORDINALITY AS slot(partner_id, window_start, window_end, position)
+        ),
+        load_window AS (
+            SELECT DISTINCT window_start, window_end FROM slot
+        ),
+        open_delivery AS (
+            SELECT load_window.window_start, deliveries.delivery_partner_id
+            FROM load_window
+            JOIN orders
+              ON orders.delivery_date >= load_window.window_start
+             AND orders.delivery_date < load_window.window_end
+             AND orders.order_status IN ('CONFIRMED', 'SHIPPED')
+            JOIN deliveries
+              ON deliveries.order_id = orders.id AND deliveries.delivery_type = 'DROP'
+            UNION ALL
+            SELECT load_window.window_start, deliveries.delivery_partner_id
+            FROM load_window
+            JOIN orders
+              ON orders.pickup_date >= load_window.window_start
+             AND orders.pickup_date < load_window.window_end
+             AND orders.order_status IN ('CONFIRMED', 'SHIPPED', 'DELIVERED')
+            JOIN deliveries
+              ON deliveries.order_id = orders.id
+             AND deliveries.delivery_type = 'PICKUP'
+        )
+        SELECT slot.position, count(open_delivery.delivery_partner_id) AS load
+        FROM slot
+        LEFT JOIN open_delivery
+          ON open_delivery.window_start = slot.window_start
+         AND open_delivery.delivery_partner_id = slot.partner_id
+        GROUP BY slot.position
+        ORDER BY slot.position
+        """
+        rows = await self.connection.fetch(
+            query,
+            [slot[0] for slot in slots],
+            [slot[1] for slot in slots],
+            [slot[2] for slot in slots],
+        )
+        return [row["load"] for row in rows]
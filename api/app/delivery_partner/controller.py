@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, status
 
 from app.base.exception_handler import http_exception_handler
 from app.base.exceptions import HTTPException
-from app.database import PgPool
+from app.database import LeasedRoute, PgPool
 from app.delivery_partner.exceptions import (
     DeliveryPartnerAlreadyExists,
     DeliveryPartnerNotFound,
@@ -21,18 +21,17 @@ from app.delivery_partner.service import DeliveryPartnerService
 from app.users.dependency import RequiresRole, get_current_user
 from app.users.models import UserType
 
-router = APIRouter(prefix="/delivery-partners", tags=["delivery-partners"])
+router = APIRouter(
+    prefix="/delivery-partners", tags=["delivery-partners"], route_class=LeasedRoute
+)
 
 
 async def get_delivery_partner_service(
     connection: asyncpg.Connection = Depends(PgPool.get_connection),
 ) -> DeliveryPartnerService:
     """Dependency to get DeliveryPartnerService with database connection"""
-    try:
-        repository = DeliveryPartnerRepository(connection)
-        yield DeliveryPartnerService(repository)
-    finally:
-        await connection.close()
+    repository = DeliveryPartnerRepository(connection)
+    yield DeliveryPartnerService(repository)
 
 
 @router.post("/", response_model=DeliveryPartner, status_code=status.HTTP_201_CREATED)
@@ -0,0 +1,18 @@
+# List of dependencies (migration that must be applied before this one)
+dependencies = ["delivery_partner.202610171030_jsonb"]
+
+# SQL to apply the migration
+apply = [
+    """--sql
+    CREATE INDEX idx_delivery_partners_pincode
+    ON delivery_partners ((address->>'pincode'))
+    WHERE is_deleted = FALSE;
+    """,
+]
+
+# SQL to rollback the migration
+rollback = [
+    """--sql
+    DROP INDEX IF EXISTS idx_delivery_partners_pincode;
+    """,
+]
@@ -1,8 +1,11 @@
+from typing import List, Optional
 from uuid import UUID
 
 import asyncpg
 
-from app.base.schemas import Address
+from app.base.instrumentation import instrumented
+from app.config import Config
+from app.database import CacheEntity, InvalidationBus
 from app.delivery_partner.exceptions import (
     DeliveryPartnerAlreadyExists,
     DeliveryPartnerNotFound,
@@ -12,8 +15,43 @@ from app.delivery_partner.models import (
     DeliveryPartner,
     UpdateDeliveryPartner,
 )
+from app.utils.cache import TTLCache
 
+config = Config()
+# Ids of the live delivery partners of a pincode, empty for pincodes nobody
+# serves. Every partner write drops the entries of the pincodes it touches and
+# publishes them on the invalidation bus for the other workers.
+pincode_partners: TTLCache[str, tuple[UUID, ...]] = TTLCache(
+    maxsize=config.PINCODE_CACHE_SIZE, ttl=config.PINCODE_CACHE_TTL
+)
+
+
+def _on_pincode_invalidated(pincode: Optional[str]) -> None:
+    if pincode is None:
+        pincode_partners.clear()
+    else:
+        pincode_partners.pop(pincode)
+
+
+InvalidationBus.register(CacheEntity.PINCODE_PARTNERS, _on_pincode_invalidated)
+
+# Pincode of the delivery partner whose user ($1) a query soft deletes, as
+# deleting a users row also deletes its partner through fk_delivery_partners_users
+DELETED_PARTNER_PINCODE = """
+(SELECT address->>'pincode' FROM delivery_partners WHERE id = $1) AS partner_pincode
+"""
 
+
+async def drop_pincode_partners(
+    connection: asyncpg.Connection, *pincodes: Optional[str]
+) -> None:
+    """Drops the cached partners of pincodes, on every worker."""
+    for pincode in set(pincodes) - {None}:
+        pincode_partners.pop(pincode)
+        await InvalidationBus.publish(connection, CacheEntity.PINCODE_PARTNERS, pincode)
+
+
+@instrumented
 class DeliveryPartnerRepository:
     def __init__(self, connection: asyncpg.Connection):
         self.connection = connection
@@ -29,14 +67,7 @@ class DeliveryPartnerRepository:
                 query,
                 delivery_partner.id,
                 delivery_partner.name,
-                delivery_partner.address.model_dump_json(),
-            )
-            return DeliveryPartner(
-                id=row["id"],
-                name=row["name"],
-                address=Address.model_validate_json(row["address"]),
-                is_deleted=row["is_deleted"],
-                created_at=row["created_at"],
+                delivery_partner.address,
             )
         except asyncpg.UniqueViolationError:
             raise DeliveryPartnerAlreadyExists(context={"id": str(delivery_partner.id)})
@@ -47,6 +78,8 @@ class DeliveryPartnerRepository:
                     "msg": "User not found with given id",
                 }
             )
+        await drop_pincode_partners(self.connection, delivery_partner.address.pincode)
+        return DeliveryPartner.model_validate(dict(row))
 
     async def list(self) -> list[DeliveryPartner]:
         query = """
@@ -55,16 +88,27 @@ class DeliveryPartnerRepository:
         WHERE is_deleted = FALSE
         """
         rows = await self.connection.fetch(query)
-        return [
-            DeliveryPartner(
-                id=row["id"],
-                name=row["name"],
-                address=Address.model_validate_json(row["address"]),
-                is_deleted=row["is_deleted"],
-                created_at=row["created_at"],
-            )
-            for row in rows
-        ]
+        return [DeliveryPartner.model_validate(dict(row)) for row in rows]
+
+    async def list_ids_by_pincodes(
+        self, pincodes: List[str]
+    ) -> dict[str, tuple[UUID, ...]]:
+        """
+        Ids of the live delivery partners serving each of the pincodes, in one
+        query served by the idx_delivery_partners_pincode expression index.
+        Pincodes nobody serves map to an empty tuple.
+        """
+        query = """
+        SELECT address->>'pincode' AS pincode, array_agg(id ORDER BY id) AS ids
+        FROM delivery_partners
+        WHERE address->>'pincode' = ANY($1::text[]) AND is_deleted = FALSE
+        GROUP BY address->>'pincode'
+        """
+        rows = await self.connection.fetch(query, pincodes)
+        partners = {pincode: () for pincode in pincodes}
+        for row in rows:
+            partners[row["pincode"]] = tuple(row["ids"])
+        return partners
 
     async def get_by_id(self, delivery_partner_id: UUID) -> DeliveryPartner:
         query = """
@@ -74,13 +118,7 @@ class DeliveryPartnerRepository:
         """
         row = await self.connection.fetchrow(query, delivery_partner_id)
         if row:
-            return DeliveryPartner(
-                id=row["id"],
-                name=row["name"],
-                address=Address.model_validate_json(row["address"]),
-                is_deleted=row["is_deleted"],
-                created_at=row["created_at"],
-            )
+            return DeliveryPartner.model_validate(dict(row))
         raise DeliveryPartnerNotFound(
             context={"delivery_partner_id": str(delivery_partner_id)}
         )
@@ -91,33 +129,43 @@ class DeliveryPartnerRepository:
         query = """
         UPDATE delivery_partners
         SET name = $2, address = $3
+        FROM (
+            SELECT address->>'pincode' AS previous_pincode
+            FROM delivery_partners
+            WHERE id = $1
+            FOR UPDATE
+        ) AS previous
         WHERE id = $1 AND is_deleted = FALSE
-        RETURNING id, name, address, is_deleted, created_at
+        RETURNING id, name, address, is_deleted, created_at, previous.previous_pincode
         """
         row = await self.connection.fetchrow(
             query,
             id,
             delivery_partner.name,
-            delivery_partner.address.model_dump_json(),
+            delivery_partner.address,
         )
         if row:
-            return DeliveryPartner(
-                id=row["id"],
-                name=row["name"],
-                address=Address.model_validate_json(row["address"]),
-                is_deleted=row["is_deleted"],
-                created_at=row["created_at"],
+            await drop_pincode_partners(
+                self.connection,
+                row["previous_pincode"],
+                delivery_partner.address.pincode,
             )
+            return DeliveryPartner.model_validate(dict(row))
         raise DeliveryPartnerNotFound(context={"delivery_partner_id": str(id)})
 
     async def delete(self, delivery_partner_id: UUID) -> None:
-        query = """
+        query = f"""
         UPDATE users
         SET is_deleted = TRUE
         WHERE id = $1
+        RETURNING {DELETED_PARTNER_PINCODE}
         """
-        result = await self.connection.execute(query, delivery_partner_id)
-        if result == "UPDATE 0":
+        row = await self.connection.fetchrow(query, delivery_partner_id)
+        if row is None:
             raise DeliveryPartnerNotFound(
                 context={"delivery_partner_id": str(delivery_partner_id)}
             )
+        await InvalidationBus.publish(
+            self.connection, CacheEntity.USER_TOKENS, delivery_partner_id
+        )
+        await drop_pincode_partners(self.connection, row["partner_pincode"])
@@ -6,7 +6,11 @@ from app.delivery_partner.models import (
     ListDeliveryPartner,
     UpdateDeliveryPartner,
 )
-from app.delivery_partner.repository import DeliveryPartnerRepository
+from app.delivery_partner.repository import (
+    DeliveryPartnerRepository,
+    pincode_partners,
+)
+from app.users.dependency import revoke_tokens
 
 
 class DeliveryPartnerService:
@@ -24,6 +28,28 @@ class DeliveryPartnerService:
         delivery_partners = await self.repository.list()
         return ListDeliveryPartner(delivery_partners=delivery_partners)
 
+    async def get_partner_ids_by_pincodes(
+        self, pincodes: list[str]
+    ) -> dict[str, tuple[UUID, ...]]:
+        """
+        Get the ids of the delivery partners serving each pincode, from the
+        pincode cache. Pincodes missing from it are read in a single query.
+        """
+        partners = {}
+        missing = []
+        for pincode in set(pincodes):
+            ids = pincode_partners.get(pincode)
+            if ids is None:
+                missing.append(pincode)
+            else:
+                partners[pincode] = ids
+        if missing:
+            fetched = await self.repository.list_ids_by_pincodes(missing)
+            for pincode, ids in fetched.items():
+                pincode_partners.set(pincode, ids)
+            partners.update(fetched)
+        return partners
+
     async def get_delivery_partner_by_id(
         self, delivery_partner_id: UUID
     ) -> DeliveryPartner:
@@ -39,3 +65,4 @@ class DeliveryPartnerService:
     async def delete_delivery_partner(self, delivery_partner_id: UUID) -> None:
         """Soft delete a delivery partner."""
         await self.repository.delete(delivery_partner_id)
+        revoke_tokens(delivery_partner_id)
@@ -2,10 +2,14 @@ from contextlib import asynccontextmanager
 
 from phonenumbers import PhoneNumber
 
-from app.database import PgPool
-from app.logging import setup_logging
+from app.categories.catalog import CategoryCatalog
+from app.database import InvalidationBus, PgPool
+from app.deliveries.assignment import get_assignment_strategy
+from app.logging import setup_logging, shutdown_logging
+from app.metrics import MetricsExporter
 from app.minio import MinioClient
 from app.sentry import init_sdk
+from app.utils.argon2 import Argon2Executor
 
 
 @asynccontextmanager
@@ -14,8 +18,18 @@ async def lifespan(app):
     PhoneNumber.default_region_code = "IN"
     init_sdk()
     setup_logging()
+    # Fails on an invalid assignment setting before serving any order
+    get_assignment_strategy()
     client = MinioClient.get_client()
     await MinioClient.make_sure_buckets_are_present(client)
     await PgPool.initiate()
+    InvalidationBus.start()
+    await InvalidationBus.wait_listening(timeout=5.0)
+    await CategoryCatalog.load()
+    await MetricsExporter.start()
     yield
+    await MetricsExporter.stop()
+    await InvalidationBus.stop()
     await PgPool.close()
+    Argon2Executor.shutdown()
+    shutdown_logging()
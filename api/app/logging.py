@@ -1,7 +1,13 @@
-from copy import deepcopy
+import os
+import sys
+from fcntl import LOCK_EX, LOCK_UN, flock
+from queue import Empty, Full, Queue
+from threading import Thread
+from time import monotonic
+from typing import Any, Optional
 
 from orjson import dumps
-from structlog import BytesLoggerFactory, configure
+from structlog import configure
 from structlog.contextvars import merge_contextvars
 from structlog.dev import ConsoleRenderer
 from structlog.processors import (
@@ -15,28 +21,227 @@ from structlog.typing import EventDict
 
 from app.config import Config
 
-__all__ = ["setup_logging"]
+__all__ = ["LogSink", "setup_logging", "shutdown_logging"]
+
+_STOP = object()
+
+
+class LogSink:
+    """
+    Writes rendered log lines to a file from a background thread.
+
+    Lines are put on a bounded queue without blocking the event loop and written
+    in batches, once `batch_size` lines are pending or `flush_interval` seconds
+    after the first one. When the queue is full new lines are dropped and
+    counted. The file is rotated once it grows beyond `max_bytes`, keeping
+    `backup_count` older files next to it (`logs.json.1`, `logs.json.2`, ...).
+
+    Every worker process appends to the same file. Rotation is done under an
+    exclusive lock on `<path>.lock` by whichever worker first sees the file
+    too large, and the others reopen the path once its inode changed. Lines
+    which could not be written are counted as dropped, the writer thread
+    never stops on I/O errors.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        queue_size: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        max_bytes: int = 100 * 1024 * 1024,
+        backup_count: int = 5,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue: Queue = Queue(maxsize=queue_size)
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+        self._reported_drops = 0
+        self._file = open(path, "ab")
+        self._lock_file = open(f"{path}.lock", "ab")
+        self._thread = Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+
+    def write(self, line: bytes) -> None:
+        try:
+            self.queue.put_nowait(line)
+        except Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Writes every queued line and stops the writer thread."""
+        if not self._thread.is_alive():
+            return
+        self.queue.put(_STOP)
+        self._thread.join()
+        self._file.close()
+        self._lock_file.close()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "errors": self.errors,
+        }
+
+    def _run(self) -> None:
+        batch: list[bytes] = []
+        deadline: Optional[float] = None
+        while True:
+            timeout = None if deadline is None else max(deadline - monotonic(), 0)
+            try:
+                line = self.queue.get(timeout=timeout)
+            except Empty:
+                line = None
+            if line is _STOP:
+                self._flush(batch)
+                return
+            if line is not None:
+                batch.append(line)
+                if deadline is None:
+                    deadline = monotonic() + self.flush_interval
+            if len(batch) >= self.batch_size or (
+                deadline is not None and monotonic() >= deadline
+            ):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+    def _flush(self, batch: list[bytes]) -> None:
+        try:
+            self._write(batch)
+        except (OSError, ValueError) as e:
+            self.errors += 1
+            self.dropped += len(batch)
+            print(f"log sink failed to write {len(batch)} lines: {e}", file=sys.stderr)
+            return
+        try:
+            if os.fstat(self._file.fileno()).st_size >= self.max_bytes:
+                self._rotate()
+        except (OSError, ValueError) as e:
+            # Retried after the next batch
+            self.errors += 1
+            print(f"log sink failed to rotate {self.path}: {e}", file=sys.stderr)
+
+    def _write(self, batch: list[bytes]) -> None:
+        dropped = self.dropped - self._reported_drops
+        if dropped:
+            self._reported_drops += dropped
+            batch.append(
+                dumps(
+                    {"event": "log_lines_dropped", "count": dropped, "level": "warning"}
+                )
+            )
+        if not batch:
+            return
+        self._reopen_if_rotated()
+        self._file.write(b"\n".join(batch) + b"\n")
+        self._file.flush()
+        self.written += len(batch)
+
+    def _reopen_if_rotated(self) -> None:
+        """Reopens the path once another worker rotated (or removed) the file."""
+        try:
+            current = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self._file.fileno()).st_ino:
+            previous, self._file = self._file, open(self.path, "ab")
+            previous.close()
+
+    def _rotate(self) -> None:
+        flock(self._lock_file, LOCK_EX)
+        try:
+            # Another worker may have rotated while this one waited for the lock
+            self._reopen_if_rotated()
+            if os.fstat(self._file.fileno()).st_size < self.max_bytes:
+                return
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            if self.backup_count > 0:
+                os.replace(self.path, f"{self.path}.1")
+            else:
+                os.remove(self.path)
+            self.rotations += 1
+            self._reopen_if_rotated()
+        finally:
+            flock(self._lock_file, LOCK_UN)
+
+
+class SinkLogger:
+    """structlog logger handing rendered events to a `LogSink`."""
+
+    __slots__ = ("sink",)
+
+    def __init__(self, sink: LogSink):
+        self.sink = sink
+
+    def msg(self, message: bytes) -> None:
+        self.sink.write(message)
+
+    log = debug = info = warn = warning = msg
+    fatal = failure = err = error = critical = exception = msg
+
+
+class SinkLoggerFactory:
+    def __init__(self, sink: LogSink):
+        self.sink = sink
+
+    def __call__(self, *args: Any) -> SinkLogger:
+        return SinkLogger(self.sink)
+
+
+sink: Optional[LogSink] = None
+
+
+def development_render(_, __, event_dict: EventDict) -> EventDict:
+    # The renderer pops the keys it prints, so a shallow copy is enough
+    print(ConsoleRenderer()(_, __, dict(event_dict)))
+    return event_dict
 
 
 def setup_logging(*args, **kwargs):
-    def development_render(_, __, event_dict: EventDict) -> EventDict:
-        config = Config()
-        if config.SERVER_ENVIRONMENT == "DEV":
-            console_dict = deepcopy(event_dict)
-            console = ConsoleRenderer()
-            print(console.__call__(_, __, console_dict))
-        return event_dict
+    global sink
+    config = Config()
+    if sink is None:
+        sink = LogSink(
+            config.LOG_FILE,
+            queue_size=config.LOG_QUEUE_SIZE,
+            batch_size=config.LOG_BATCH_SIZE,
+            flush_interval=config.LOG_FLUSH_INTERVAL,
+            max_bytes=config.LOG_MAX_BYTES,
+            backup_count=config.LOG_BACKUP_COUNT,
+        )
+    processors = [
+        merge_contextvars,
+        add_log_level,
+        StackInfoRenderer(),
+        TimeStamper(fmt="iso"),
+    ]
+    if config.SERVER_ENVIRONMENT == "DEV":
+        processors.append(development_render)
+    processors += [dict_tracebacks, JSONRenderer(serializer=dumps)]
 
     configure(
-        processors=[
-            merge_contextvars,
-            add_log_level,
-            StackInfoRenderer(),
-            TimeStamper(fmt="iso"),
-            development_render,
-            dict_tracebacks,
-            JSONRenderer(serializer=dumps),
-        ],
-        logger_factory=BytesLoggerFactory(open("./logs.json", "ab")),
+        processors=processors,
+        logger_factory=SinkLoggerFactory(sink),
         cache_logger_on_first_use=True,
     )
+
+
+def shutdown_logging():
+    """Flushes the pending log lines, called on shutdown."""
+    global sink
+    if sink is not None:
+        sink.close()
+        sink = None
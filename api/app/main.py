@@ -1,12 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.categories.controller import router as categories_router
 from app.customers.controller import router as customers_router
 from app.deliveries.controller import router as deliveries_router
 from app.delivery_partner.controller import router as delivery_partner_router
 from app.lifespan import lifespan
-from app.middleware import ContextMiddleware, LoggingMiddleware, RequestIDMiddleware
+from app.metrics import MetricsExporter
+from app.middleware import AuthMiddleware, RequestContextMiddleware
 from app.orders.controller import router as orders_router
 from app.products.controller import router as products_router
 from app.shop_owner.controller import router as shop_owner_router
@@ -16,9 +18,8 @@ from app.users.controller import router as users_router
 def create_app():
     app = FastAPI(title="CMS", lifespan=lifespan)
     # app.add_exception_handler(HTTPException, http_exception_handler)
-    app.add_middleware(LoggingMiddleware)
-    app.add_middleware(ContextMiddleware)
-    app.add_middleware(RequestIDMiddleware)
+    app.add_middleware(AuthMiddleware)
+    app.add_middleware(RequestContextMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
@@ -41,6 +42,13 @@ def create_app():
     async def health_check():
         return {"status": "ok"}
 
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(
+            await MetricsExporter.render(),
+            media_type="text/plain; version=0.0.4",
+        )
+
     return app
 
 
@@ -0,0 +1,371 @@
+import asyncio
+import fcntl
+import os
+from contextlib import contextmanager
+from time import time
+from typing import Any, ClassVar, Iterator, Optional
+
+from orjson import dumps, loads
+
+from app import logging
+from app.base.instrumentation import QueryLogger
+from app.categories.catalog import CategoryCatalog
+from app.config import Config
+from app.database import InvalidationBus, PgPool
+from app.delivery_partner.repository import pincode_partners
+from app.minio import MinioClient
+from app.products.repository import product_cache
+from app.sentry import sampling_decisions
+from app.utils.argon2 import Argon2Executor
+from app.utils.metrics import (
+    Counter,
+    HistogramFamily,
+    histogram_samples,
+    merge_families,
+    render_families,
+)
+
+__all__ = ["HTTPMetrics", "MetricsExporter", "collect"]
+
+# Snapshot holding the totals of the workers that are gone
+DEAD = "dead.json"
+# Families kept once their worker is gone, as they count since it started
+DEAD_TYPES = ("counter", "histogram")
+
+
+class HTTPMetrics:
+    """Request metrics, recorded by `RequestContextMiddleware`."""
+
+    in_flight: ClassVar[int] = 0
+    durations: ClassVar[HistogramFamily] = HistogramFamily("method", "route")
+    responses: ClassVar[Counter] = Counter("method", "route", "status")
+
+
+def _family(
+    name: str, type: str, help: str, samples: list, merge: str = "sum"
+) -> dict[str, Any]:
+    return {
+        "name": name,
+        "type": type,
+        "help": help,
+        "samples": samples,
+        "merge": merge,
+    }
+
+
+def _gauge(name: str, help: str, value: float, merge: str = "sum") -> dict[str, Any]:
+    return _family(name, "gauge", help, [(name, {}, value)], merge)
+
+
+def _histograms(name: str, help: str, snapshots: list[dict[str, Any]]) -> dict:
+    samples = []
+    for snapshot in snapshots:
+        labels = {
+            key: value
+            for key, value in snapshot.items()
+            if key not in ("buckets", "sum", "count")
+        }
+        samples += histogram_samples(name, snapshot, labels)
+    return _family(name, "histogram", help, samples)
+
+
+def _counters(name: str, help: str, snapshot: list[dict[str, Any]]) -> dict:
+    samples = []
+    for counter in snapshot:
+        labels = {key: value for key, value in counter.items() if key != "count"}
+        samples.append((name, labels, counter["count"]))
+    return _family(name, "counter", help, samples)
+
+
+def collect() -> list[dict[str, Any]]:
+    """Metric families of this process."""
+    families = [
+        _gauge(
+            "http_requests_in_flight",
+            "Requests being served.",
+            HTTPMetrics.in_flight,
+        ),
+        _histograms(
+            "http_request_duration_seconds",
+            "Time to serve a request, by route.",
+            HTTPMetrics.durations.snapshot(),
+        ),
+        _counters(
+            "http_responses_total",
+            "Responses sent, by route and status code.",
+            HTTPMetrics.responses.snapshot(),
+        ),
+    ]
+
+    pool = PgPool.stats()
+    if pool:
+        families += [
+            _gauge("db_pool_size", "Connections opened by the pool.", pool["size"]),
+            _gauge("db_pool_max_size", "Maximum size of the pool.", pool["max_size"]),
+            _gauge(
+                "db_pool_in_use", "Connections leased from the pool.", pool["in_use"]
+            ),
+            _gauge("db_pool_idle", "Idle connections of the pool.", pool["idle"]),
+            _gauge(
+                "db_pool_waiters",
+                "Requests waiting for a connection.",
+                pool["waiters"],
+            ),
+            _histograms(
+                "db_pool_acquire_seconds",
+                "Time to acquire a connection.",
+                [pool["acquire_latency"]],
+            ),
+        ]
+    families.append(
+        _histograms(
+            "db_query_duration_seconds",
+            "Time to run a query, by repository method.",
+            QueryLogger.durations.snapshot(),
+        )
+    )
+
+    argon2 = Argon2Executor.stats()
+    families += [
+        _gauge(
+            "argon2_in_flight",
+            "Password hashes and verifications running or queued.",
+            argon2["in_flight"],
+        ),
+        _family(
+            "argon2_rejected_total",
+            "counter",
+            "Password operations rejected as the hasher was saturated.",
+            [("argon2_rejected_total", {}, argon2["rejected"])],
+        ),
+        _histograms(
+            "argon2_duration_seconds",
+            "Time to hash or verify a password, queueing included.",
+            [argon2["durations"]],
+        ),
+        _histograms(
+            "minio_upload_duration_seconds",
+            "Time to upload an object to MinIO, by bucket.",
+            MinioClient.upload_latency.snapshot(),
+        ),
+        _counters(
+            "sentry_transaction_decisions_total",
+            "Sentry sampling decisions, by route and decision.",
+            sampling_decisions.snapshot(),
+        ),
+    ]
+
+    bus = InvalidationBus.stats()
+    families += [
+        _gauge(
+            "invalidation_bus_connected",
+            "Whether the invalidation listener is connected.",
+            int(bus["connected"]),
+        ),
+        _counters(
+            "invalidation_messages_total",
+            "Invalidation messages, by direction.",
+            [
+                {"direction": "published", "count": bus["published"]},
+                {"direction": "received", "count": bus["received"]},
+            ],
+        ),
+        _family(
+            "invalidation_reconnects_total",
+            "counter",
+            "Reconnections of the invalidation listener, each flushing the caches.",
+            [("invalidation_reconnects_total", {}, bus["reconnects"])],
+        ),
+        _histograms(
+            "invalidation_lag_seconds",
+            "Time from publishing an invalidation to receiving it.",
+            [bus["lag"]],
+        ),
+    ]
+
+    caches = {
+        "product": product_cache.stats(),
+        "pincode_partners": pincode_partners.stats(),
+    }
+    families += [
+        _family(
+            f"cache_{name}_total",
+            "counter",
+            f"Cache {name}, by cache.",
+            [
+                (f"cache_{name}_total", {"cache": cache}, stats[name])
+                for cache, stats in caches.items()
+            ],
+        )
+        for name in ("hits", "misses", "evictions")
+    ]
+    families.append(
+        _family(
+            "cache_entries",
+            "gauge",
+            "Entries held, by cache.",
+            [
+                ("cache_entries", {"cache": cache}, stats["size"])
+                for cache, stats in caches.items()
+            ],
+        )
+    )
+
+    catalog = CategoryCatalog.stats()
+    families += [
+        _gauge(
+            "category_snapshot_version",
+            "Version of the category snapshot, bumped on every change.",
+            catalog["version"],
+            merge="max",
+        ),
+        _gauge(
+            "category_snapshot_size",
+            "Categories held by the category snapshot.",
+            catalog["size"],
+            merge="max",
+        ),
+    ]
+
+    if logging.sink is not None:
+        sink = logging.sink.stats()
+        families += [
+            _gauge(
+                "log_queue_depth", "Log lines waiting to be written.", sink["queued"]
+            ),
+            _family(
+                "log_lines_dropped_total",
+                "counter",
+                "Log lines dropped as the queue was full.",
+                [("log_lines_dropped_total", {}, sink["dropped"])],
+            ),
+        ]
+    return families
+
+
+class MetricsExporter:
+    """
+    Aggregates the metrics of every worker process.
+
+    Each worker periodically writes its metrics to `<METRICS_DIR>/<pid>.json`.
+    A scrape, served by any worker, merges its live metrics with the snapshots
+    of the others. Workers that stop, and snapshots not refreshed for a few
+    intervals, are folded into `dead.json`: their counters and histograms are
+    kept so totals never go down, their gauges are dropped.
+    """
+
+    directory: ClassVar[str] = "./.metrics"
+    interval: ClassVar[float] = 5.0
+    _task: ClassVar[Optional[asyncio.Task]] = None
+
+    @classmethod
+    def _path(cls, pid: int) -> str:
+        return os.path.join(cls.directory, f"{pid}.json")
+
+    @classmethod
+    def _dump(cls, path: str, families: list[dict[str, Any]]) -> None:
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(dumps(families))
+        os.replace(temporary, path)
+
+    @classmethod
+    def _write(cls, families: list[dict[str, Any]]) -> None:
+        cls._dump(cls._path(os.getpid()), families)
+
+    @classmethod
+    @contextmanager
+    def _locked(cls) -> Iterator[None]:
+        """Serializes folding snapshots into `dead.json` between workers."""
+        with open(os.path.join(cls.directory, "dead.lock"), "wb") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @classmethod
+    def _fold(cls, dead: list[dict[str, Any]], families: list[dict[str, Any]]) -> list:
+        """Adds the counters and histograms of a gone worker to `dead`."""
+        kept = [family for family in families if family["type"] in DEAD_TYPES]
+        dead = merge_families([dead, kept])
+        cls._dump(os.path.join(cls.directory, DEAD), dead)
+        return dead
+
+    @classmethod
+    def _read(cls, path: str) -> list[dict[str, Any]]:
+        with open(path, "rb") as f:
+            return loads(f.read())
+
+    @classmethod
+    def _read_others(cls) -> list[list[dict[str, Any]]]:
+        own = f"{os.getpid()}.json"
+        expired_before = time() - 3 * cls.interval
+        snapshots = []
+        if not os.path.isdir(cls.directory):
+            return snapshots
+        # Held while reading so a snapshot being folded is not counted twice
+        with cls._locked():
+            try:
+                dead = cls._read(os.path.join(cls.directory, DEAD))
+            except (OSError, ValueError):
+                dead = []
+            for name in os.listdir(cls.directory):
+                if not name.endswith(".json") or name in (own, DEAD):
+                    continue
+                path = os.path.join(cls.directory, name)
+                try:
+                    expired = os.path.getmtime(path) < expired_before
+                    snapshot = cls._read(path)
+                except (OSError, ValueError):
+                    # Removed or being replaced by its worker
+                    continue
+                if expired:
+                    dead = cls._fold(dead, snapshot)
+                    os.remove(path)
+                else:
+                    snapshots.append(snapshot)
+        snapshots.append(dead)
+        return snapshots
+
+    @classmethod
+    def _retire(cls, families: list[dict[str, Any]]) -> None:
+        """Folds the final metrics of this worker into `dead.json`."""
+        with cls._locked():
+            try:
+                dead = cls._read(os.path.join(cls.directory, DEAD))
+            except (OSError, ValueError):
+                dead = []
+            cls._fold(dead, families)
+            try:
+                os.remove(cls._path(os.getpid()))
+            except OSError:
+                pass
+
+    @classmethod
+    async def start(cls) -> None:
+        config = Config()
+        cls.directory = config.METRICS_DIR
+        cls.interval = config.METRICS_INTERVAL
+        os.makedirs(cls.directory, exist_ok=True)
+        cls._task = asyncio.create_task(cls._publish())
+
+    @classmethod
+    async def _publish(cls) -> None:
+        while True:
+            await asyncio.to_thread(cls._write, collect())
+            await asyncio.sleep(cls.interval)
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._task is None:
+            return
+        cls._task.cancel()
+        cls._task = None
+        await asyncio.to_thread(cls._retire, collect())
+
+    @classmethod
+    async def render(cls) -> str:
+        """Metrics of every worker in the Prometheus text format."""
+        others = await asyncio.to_thread(cls._read_others)
+        return render_families(merge_families([collect(), *others]))
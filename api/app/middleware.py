@@ -1,38 +1,190 @@
+from time import perf_counter
+from typing import Optional
 from uuid import uuid4
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+
+from fastapi import FastAPI
+from fastapi.dependencies.models import Dependant
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pyseto import VerifyError
+from starlette.datastructures import MutableHeaders
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from structlog import get_logger
 from structlog.contextvars import bind_contextvars, clear_contextvars
 
+from app.base.instrumentation import QueryStats, request_queries
+from app.config import Config
+from app.metrics import HTTPMetrics
+from app.users.dependency import RequiresRole, decode_token, get_current_user
+from app.users.models import UserType
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        request_id = str(uuid4())
-        request.state.request_id = request_id
-        response = await call_next(request)
-        response.headers["X-Request-ID"] = request_id
-        return response
 
+class RequestContextMiddleware:
+    """
+    Assigns each request an ID, binds it to the structlog context, logs the
+    request and its response and returns the ID in `X-Request-ID`.
+
+    Messages are passed through as they are sent, so streaming responses are
+    never buffered. With `POSTGRES_QUERY_SUMMARY` the response line also counts
+    the queries of the request and the time they took.
+    """
 
-class ContextMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        bind_contextvars(request_id=request.state.request_id)
-        response = await call_next(request)
-        clear_contextvars()
-        return response
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.query_summary = Config().POSTGRES_QUERY_SUMMARY
 
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+        queries = QueryStats() if self.query_summary else None
+        request_queries.set(queries)
+        started = perf_counter()
+        HTTPMetrics.in_flight += 1
+        status_code = 500
+        request_id = str(uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        method = scope["method"]
+        path = scope["path"]
+        bind_contextvars(request_id=request_id)
         logger = get_logger()
-        logger.info(
-            event="request_recieved", method=request.method, path=request.url.path
-        )
-        response = await call_next(request)
-        logger.info(
-            event="response_sent",
-            method=request.method,
-            path=request.url.path,
-            status_code=response.status_code,
-        )
-        return response
\ No newline at end of file
+        logger.info(event="request_recieved", method=method, path=path)
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+                summary = (
+                    {"db_queries": queries.count, "db_time": round(queries.elapsed, 4)}
+                    if queries is not None
+                    else {}
+                )
+                logger.info(
+                    event="response_sent",
+                    method=method,
+                    path=path,
+                    status_code=message["status"],
+                    **summary,
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            clear_contextvars()
+            HTTPMetrics.in_flight -= 1
+            # Route templates keep the label values bounded
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            HTTPMetrics.durations.observe(perf_counter() - started, method, route_path)
+            HTTPMetrics.responses.inc(method, route_path, str(status_code))
+
+
+# Routes of the app in routing order with the roles allowed on each, None when
+# the route is public
+RouteRoles = list[tuple[BaseRoute, Optional[frozenset[UserType]]]]
+
+
+def _strip_auth(dependant: Dependant) -> Optional[frozenset[UserType]]:
+    """
+    Removes the `RequiresRole` and `get_current_user` markers listed in the
+    `dependencies` of a route, returning the roles allowed on it.
+    """
+    roles = None
+    kept = []
+    for dependency in dependant.dependencies:
+        call = dependency.call
+        if dependency.name is None and (
+            call is get_current_user or isinstance(call, RequiresRole)
+        ):
+            allowed = (
+                frozenset(call.required_roles)
+                if isinstance(call, RequiresRole)
+                else frozenset(UserType)
+            )
+            roles = allowed if roles is None else roles & allowed
+        else:
+            kept.append(dependency)
+    dependant.dependencies[:] = kept
+    return roles
+
+
+def build_route_roles(app: FastAPI) -> RouteRoles:
+    """
+    Builds the role table of the app from the declared requirements of its
+    routes, once per app. The OpenAPI schema is generated beforehand so it
+    still documents the security of each route.
+    """
+    route_roles = getattr(app.state, "route_roles", None)
+    if route_roles is None:
+        app.openapi()
+        route_roles = [
+            (
+                route,
+                _strip_auth(route.dependant) if isinstance(route, APIRoute) else None,
+            )
+            for route in app.routes
+        ]
+        app.state.route_roles = route_roles
+    return route_roles
+
+
+class AuthMiddleware:
+    """
+    Authenticates requests before they are routed, from the role table built at
+    startup. Unauthorized requests are rejected before their body is read, the
+    user of the others is stored in the request state.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.routes: Optional[RouteRoles] = None
+
+    def _roles(self, scope: Scope) -> Optional[frozenset[UserType]]:
+        """Roles allowed on the route the router will pick, None if public."""
+        for route, roles in self.routes:
+            match, _ = route.matches(scope)
+            if match is Match.FULL:
+                # Labels the metrics of requests rejected before routing
+                scope["route"] = route
+                return roles
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            self.routes = build_route_roles(scope["app"])
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if self.routes is None:
+            self.routes = build_route_roles(scope["app"])
+
+        roles = self._roles(scope)
+        if roles is not None:
+            user = None
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    scheme, _, credentials = value.decode("latin-1").partition(" ")
+                    if scheme.lower() == "bearer" and credentials:
+                        try:
+                            user = decode_token(credentials)
+                        except (VerifyError, ValueError):
+                            response = JSONResponse(
+                                {"detail": "Invalid token"}, status_code=401
+                            )
+                            return await response(scope, receive, send)
+                    break
+            if user is None:
+                response = JSONResponse(
+                    {"detail": "Invalid credentials"}, status_code=401
+                )
+                return await response(scope, receive, send)
+            if user.role not in roles:
+                response = JSONResponse(
+                    {"detail": "Not enough permissions"}, status_code=403
+                )
+                return await response(scope, receive, send)
+            scope.setdefault("state", {})["user"] = user
+
+        await self.app(scope, receive, send)
@@ -1,10 +1,25 @@
+from time import perf_counter
+from typing import Any, ClassVar
+
 from miniopy_async import Minio
 from orjson import dumps
 
 from app.config import Config
+from app.utils.metrics import HistogramFamily
 
 
 class MinioClient:
+    upload_latency: ClassVar[HistogramFamily] = HistogramFamily("bucket")
+
+    @classmethod
+    async def upload(cls, client: Minio, bucket_name: str, **kwargs: Any):
+        """`put_object` recording the upload latency of the bucket."""
+        started = perf_counter()
+        try:
+            return await client.put_object(bucket_name=bucket_name, **kwargs)
+        finally:
+            cls.upload_latency.observe(perf_counter() - started, bucket_name)
+
     @staticmethod
     async def make_sure_buckets_are_present(client: Minio):
         print("Checking if buckets exist...")
@@ -1,11 +1,14 @@
+from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
 import asyncpg
 from fastapi import APIRouter, Depends, Query, status
+from fastapi import status as http_status
 
 from app.base.exception_handler import http_exception_handler
-from app.base.exceptions import HTTPException
-from app.database import PgPool
+from app.base.exceptions import HTTPException, InvalidCursor
+from app.database import LeasedRoute, PgPool
 from app.orders.exceptions import (
     DeliveryServiceNotAvailable,
     InsufficientPayment,
@@ -35,18 +38,15 @@ from app.orders.service import OrderService
 from app.users.dependency import RequiresRole, get_current_user
 from app.users.models import UserType
 
-router = APIRouter(prefix="/orders", tags=["orders"])
+router = APIRouter(prefix="/orders", tags=["orders"], route_class=LeasedRoute)
 
 
 async def get_order_service(
     connection: asyncpg.Connection = Depends(PgPool.get_connection),
 ) -> OrderService:
     """Dependency to get OrderService with database connection"""
-    try:
-        repository = OrderRepository(connection)
-        yield OrderService(repository)
-    finally:
-        await connection.close()
+    repository = OrderRepository(connection)
+    yield OrderService(repository)
 
 
 @router.post(
@@ -88,11 +88,22 @@ async def create_order(
 )
 async def get_orders(
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Cursor of the page to fetch"),
+    offset: int = Query(
+        0, ge=0, deprecated=True, description="Use cursor, which is faster"
+    ),
     service: OrderService = Depends(get_order_service),
 ) -> ListOrder:
     """Get all orders with pagination."""
-    return await service.get_orders(limit=limit, offset=offset)
+    try:
+        return await service.get_orders(limit=limit, cursor=cursor, offset=offset)
+    except InvalidCursor as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                error=e,
+            )
+        )
 
 
 @router.get(
@@ -121,11 +132,24 @@ async def get_order(
 async def get_orders_by_user(
     user_id: UUID,
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Cursor of the page to fetch"),
+    offset: int = Query(
+        0, ge=0, deprecated=True, description="Use cursor, which is faster"
+    ),
     service: OrderService = Depends(get_order_service),
 ) -> ListOrder:
     """Get orders for a specific user."""
-    return await service.get_orders_by_user(user_id, limit=limit, offset=offset)
+    try:
+        return await service.get_orders_by_user(
+            user_id, limit=limit, cursor=cursor, offset=offset
+        )
+    except InvalidCursor as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                error=e,
+            )
+        )
 
 
 @router.get(
@@ -136,11 +160,24 @@ async def get_orders_by_user(
 async def get_orders_by_product(
     product_id: UUID,
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Cursor of the page to fetch"),
+    offset: int = Query(
+        0, ge=0, deprecated=True, description="Use cursor, which is faster"
+    ),
     service: OrderService = Depends(get_order_service),
 ) -> ListOrder:
     """Get orders for a specific product."""
-    return await service.get_orders_by_product(product_id, limit=limit, offset=offset)
+    try:
+        return await service.get_orders_by_product(
+            product_id, limit=limit, cursor=cursor, offset=offset
+        )
+    except InvalidCursor as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                error=e,
+            )
+        )
 
 
 @router.get(
@@ -150,10 +187,36 @@ async def get_orders_by_product(
 )
 async def get_orders_by_shop_owner(
     shop_owner: UUID,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Cursor of the page to fetch"),
+    order_status: Optional[OrderStatus] = Query(
+        None, alias="status", description="Filter by order status"
+    ),
+    created_after: Optional[datetime] = Query(
+        None, description="Only orders created at or after this time"
+    ),
+    created_before: Optional[datetime] = Query(
+        None, description="Only orders created before this time"
+    ),
     service: OrderService = Depends(get_order_service),
 ) -> ListOrder:
     """Get orders for a specific shop owner."""
-    return await service.get_order_by_shop_owner(shop_owner)
+    try:
+        return await service.get_order_by_shop_owner(
+            shop_owner,
+            limit=limit,
+            cursor=cursor,
+            status=order_status,
+            created_after=created_after,
+            created_before=created_before,
+        )
+    except InvalidCursor as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                error=e,
+            )
+        )
 
 
 @router.get(
@@ -164,11 +227,24 @@ async def get_orders_by_shop_owner(
 async def get_orders_by_status(
     status: OrderStatus,
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Cursor of the page to fetch"),
+    offset: int = Query(
+        0, ge=0, deprecated=True, description="Use cursor, which is faster"
+    ),
     service: OrderService = Depends(get_order_service),
 ) -> ListOrder:
     """Get orders by status."""
-    return await service.get_orders_by_status(status, limit=limit, offset=offset)
+    try:
+        return await service.get_orders_by_status(
+            status, limit=limit, cursor=cursor, offset=offset
+        )
+    except InvalidCursor as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=http_status.HTTP_400_BAD_REQUEST,
+                error=e,
+            )
+        )
 
 
 @router.patch(
@@ -0,0 +1,50 @@
+# List of dependencies (migration that must be applied before this one)
+dependencies = ["orders.202508110732_initial"]
+
+# SQL to apply the migration
+# Indexes matching the `created_at DESC, id DESC` keyset pagination of orders.
+# They supersede the single column indexes on user_id and product_id.
+apply = [
+    """--sql
+    CREATE INDEX idx_orders_created ON orders(created_at DESC, id DESC);
+    """,
+    """--sql
+    CREATE INDEX idx_orders_user_created ON orders(user_id, created_at DESC, id DESC);
+    """,
+    """--sql
+    CREATE INDEX idx_orders_product_created
+        ON orders(product_id, created_at DESC, id DESC);
+    """,
+    """--sql
+    CREATE INDEX idx_orders_status_created
+        ON orders(order_status, created_at DESC, id DESC);
+    """,
+    """--sql
+    DROP INDEX IF EXISTS idx_users_orders;
+    """,
+    """--sql
+    DROP INDEX IF EXISTS idx_orders_product;
+    """,
+]
+
+# SQL to rollback the migration
+rollback = [
+    """--sql
+    CREATE INDEX IF NOT EXISTS idx_orders_product ON orders(product_id);
+    """,
+    """--sql
+    CREATE INDEX IF NOT EXISTS idx_users_orders ON orders(user_id);
+    """,
+    """--sql
+    DROP INDEX IF EXISTS idx_orders_status_created;
+    """,
+    """--sql
+    DROP INDEX IF EXISTS idx_orders_product_created;
+    """,
+    """--sql
+    DROP INDEX IF EXISTS idx_orders_user_created;
+    """,
+    """--sql
+    DROP INDEX IF EXISTS idx_orders_created;
+    """,
+]
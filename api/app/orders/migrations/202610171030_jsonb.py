@@ -0,0 +1,33 @@
+# List of dependencies (migration that must be applied before this one)
+dependencies = ["orders.202610171010_keyset_indexes"]
+
+# SQL to apply the migration
+# Documents were stored as JSON strings holding the serialized document, they
+# are unwrapped while converting the columns to JSONB.
+apply = [
+    """--sql
+    ALTER TABLE orders
+        ALTER COLUMN amount TYPE JSONB USING CASE
+            WHEN json_typeof(amount) = 'string' THEN (amount #>> '{}')::jsonb
+            ELSE amount::jsonb
+        END,
+        ALTER COLUMN delivery_location TYPE JSONB USING CASE
+            WHEN json_typeof(delivery_location) = 'string' THEN (delivery_location #>> '{}')::jsonb
+            ELSE delivery_location::jsonb
+        END,
+        ALTER COLUMN pickup_location TYPE JSONB USING CASE
+            WHEN json_typeof(pickup_location) = 'string' THEN (pickup_location #>> '{}')::jsonb
+            ELSE pickup_location::jsonb
+        END;
+    """,
+]
+
+# SQL to rollback the migration
+rollback = [
+    """--sql
+    ALTER TABLE orders
+        ALTER COLUMN amount TYPE JSON USING to_json(amount::text),
+        ALTER COLUMN delivery_location TYPE JSON USING to_json(delivery_location::text),
+        ALTER COLUMN pickup_location TYPE JSON USING to_json(pickup_location::text);
+    """,
+]
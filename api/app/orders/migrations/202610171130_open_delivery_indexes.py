@@ -0,0 +1,26 @@
+# List of dependencies (migration that must be applied before this one)
+dependencies = ["orders.202610171030_jsonb"]
+
+# SQL to apply the migration
+# Orders with a drop or a pickup still to do, by the day it is scheduled, used
+# to compute the load of delivery partners.
+apply = [
+    """--sql
+    CREATE INDEX idx_orders_open_drops ON orders(delivery_date)
+    WHERE order_status IN ('CONFIRMED', 'SHIPPED');
+    """,
+    """--sql
+    CREATE INDEX idx_orders_open_pickups ON orders(pickup_date)
+    WHERE order_status IN ('CONFIRMED', 'SHIPPED', 'DELIVERED');
+    """,
+]
+
+# SQL to rollback the migration
+rollback = [
+    """--sql
+    DROP INDEX IF EXISTS idx_orders_open_pickups;
+    """,
+    """--sql
+    DROP INDEX IF EXISTS idx_orders_open_drops;
+    """,
+]
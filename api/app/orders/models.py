@@ -101,3 +101,6 @@ class UpdateRatings(BaseModel):
 
 class ListOrder(BaseModel):
     orders: list[Order]
+    next_cursor: Optional[str] = Field(
+        None, description="Cursor of the next page, absent on the last page"
+    )
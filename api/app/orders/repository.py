@@ -1,11 +1,12 @@
-import json
 from datetime import datetime
+from typing import Any, List, Optional
 from uuid import UUID
 
 import asyncpg
 from uuid_utils.compat import uuid7
 
-from app.base.schemas import Address
+from app.base.instrumentation import instrumented
+from app.base.pagination import keyset_condition, next_page
 from app.orders.exceptions import InvalidRentDates, OrderNotFound
 from app.orders.models import (
     Amount,
@@ -13,7 +14,6 @@ from app.orders.models import (
     ListOrder,
     Order,
     OrderStatus,
-    PaymentStatus,
     UpdateAmountPaid,
     UpdateDeliveryPhotoId,
     UpdateOrderStatus,
@@ -23,6 +23,7 @@ from app.orders.models import (
 )
 
 
+@instrumented
 class OrderRepository:
     def __init__(self, connection: asyncpg.Connection):
         self.connection = connection
@@ -51,11 +52,11 @@ class OrderRepository:
             order_data.quantity,
             order_data.rent_start_date,
             order_data.rent_end_date,
-            order_data.delivery_location.model_dump_json(),
-            order_data.pickup_location.model_dump_json(),
+            order_data.delivery_location,
+            order_data.pickup_location,
             order_data.delivery_date,
             order_data.pickup_date,
-            amt.model_dump_json(),
+            amt,
             0.00,
             amt.total,
             order_data.order_status.value,
@@ -66,16 +67,11 @@ class OrderRepository:
 
         return self._row_to_order(row)
 
-    async def list(self, limit: int = 100, offset: int = 0) -> ListOrder:
+    async def list(
+        self, limit: int = 100, cursor: Optional[str] = None, offset: int = 0
+    ) -> ListOrder:
         """List all orders with pagination"""
-        query = """
-        SELECT * FROM orders 
-        ORDER BY created_at DESC 
-        LIMIT $1 OFFSET $2
-        """
-        rows = await self.connection.fetch(query, limit, offset)
-        orders = [self._row_to_order(row) for row in rows]
-        return ListOrder(orders=orders)
+        return await self._page([], [], limit, cursor, offset)
 
     async def get_by_id(self, order_id: UUID) -> Order:
         """Get order by ID"""
@@ -87,46 +83,68 @@ class OrderRepository:
         return self._row_to_order(row)
 
     async def get_by_user_id(
-        self, user_id: UUID, limit: int = 100, offset: int = 0
+        self,
+        user_id: UUID,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        offset: int = 0,
     ) -> ListOrder:
         """Get orders by user ID with pagination"""
-        query = """
-        SELECT * FROM orders 
-        WHERE user_id = $1 
-        ORDER BY created_at DESC 
-        LIMIT $2 OFFSET $3
-        """
-        rows = await self.connection.fetch(query, user_id, limit, offset)
-        orders = [self._row_to_order(row) for row in rows]
-        return ListOrder(orders=orders)
+        return await self._page(["user_id = $1"], [user_id], limit, cursor, offset)
 
     async def get_by_product_id(
-        self, product_id: UUID, limit: int = 100, offset: int = 0
+        self,
+        product_id: UUID,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        offset: int = 0,
     ) -> ListOrder:
         """Get orders by product ID"""
-        query = """
-        SELECT * FROM orders 
-        WHERE product_id = $1 
-        ORDER BY created_at DESC 
-        LIMIT $2 OFFSET $3
-        """
-        rows = await self.connection.fetch(query, product_id, limit, offset)
-        orders = [self._row_to_order(row) for row in rows]
-        return ListOrder(orders=orders)
+        return await self._page(
+            ["product_id = $1"], [product_id], limit, cursor, offset
+        )
 
     async def get_by_status(
-        self, status: OrderStatus, limit: int = 100, offset: int = 0
+        self,
+        status: OrderStatus,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        offset: int = 0,
     ) -> ListOrder:
         """Get orders by status"""
-        query = """
-        SELECT * FROM orders 
-        WHERE order_status = $1 
-        ORDER BY created_at DESC 
-        LIMIT $2 OFFSET $3
+        return await self._page(
+            ["order_status = $1"], [status.value], limit, cursor, offset
+        )
+
+    async def _page(
+        self,
+        conditions: List[str],
+        args: List[Any],
+        limit: int,
+        cursor: Optional[str],
+        offset: int,
+    ) -> ListOrder:
+        """
+        Fetches a page of orders in `created_at DESC, id DESC` order.
+
+        Pages are located with the keyset `cursor` so deep pages cost the same as
+        the first one. `offset` is only kept for clients that have not moved to
+        cursors yet.
+        """
+        if cursor is not None:
+            conditions = [*conditions, keyset_condition(cursor, args)]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        args.extend((limit + 1, offset))
+        query = f"""
+        SELECT * FROM orders
+        {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ${len(args) - 1} OFFSET ${len(args)}
         """
-        rows = await self.connection.fetch(query, status.value, limit, offset)
+        rows = await self.connection.fetch(query, *args)
+        rows, next_cursor = next_page(rows, limit)
         orders = [self._row_to_order(row) for row in rows]
-        return ListOrder(orders=orders)
+        return ListOrder(orders=orders, next_cursor=next_cursor)
 
     async def update_amount_paid(
         self, order_id: UUID, update_data: UpdateAmountPaid
@@ -243,41 +261,52 @@ class OrderRepository:
 
     def _row_to_order(self, row: asyncpg.Record) -> Order:
         """Convert database row to Order model"""
-        return Order(
-            id=row["id"],
-            user_id=row["user_id"],
-            product_id=row["product_id"],
-            quantity=row["quantity"],
-            rent_start_date=row["rent_start_date"],
-            rent_end_date=row["rent_end_date"],
-            delivery_location=Address(**json.loads(row["delivery_location"])),
-            pickup_location=Address(**json.loads(row["pickup_location"])),
-            delivery_date=row["delivery_date"],
-            pickup_date=row["pickup_date"],
-            amount=Amount(**json.loads(row["amount"])),
-            amount_paid=float(row["amount_paid"]),
-            amount_due=float(row["amount_due"]),
-            order_status=OrderStatus(row["order_status"]),
-            payment_status=PaymentStatus(row["payment_status"]),
-            delivery_photo_id=list(row["delivery_photo_id"])
-            if row["delivery_photo_id"]
-            else [],
-            pickup_photo_id=list(row["pickup_photo_id"])
-            if row["pickup_photo_id"]
-            else [],
-            ratings=row["ratings"],
-            created_at=row["created_at"],
-            updated_at=row["updated_at"],
-        )
+        return Order.model_validate(dict(row))
 
-    async def get_order_by_shop_owner(self, shop_owner: UUID):
-        query = """
-        SELECT * FROM orders 
-        WHERE product_id IN (
-            SELECT id FROM products WHERE owner_id = $1
-        )
-        ORDER BY created_at DESC
+    async def get_order_by_shop_owner(
+        self,
+        shop_owner: UUID,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        status: Optional[OrderStatus] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+    ) -> ListOrder:
+        """
+        Get a page of the orders placed on the products of a shop owner.
+
+        The newest `limit + 1` matching orders of each product are taken from the
+        (product_id, created_at DESC, id DESC) index and merged, so a page never
+        reads more than `limit + 1` orders per product however many orders the
+        shop has.
+        """
+        args: List[Any] = [shop_owner]
+        conditions = ["orders.product_id = products.id"]
+        if status is not None:
+            args.append(status.value)
+            conditions.append(f"order_status = ${len(args)}")
+        if created_after is not None:
+            args.append(created_after)
+            conditions.append(f"created_at >= ${len(args)}")
+        if created_before is not None:
+            args.append(created_before)
+            conditions.append(f"created_at < ${len(args)}")
+        if cursor is not None:
+            conditions.append(keyset_condition(cursor, args))
+        args.append(limit + 1)
+        query = f"""
+        SELECT shop_orders.* FROM products
+        CROSS JOIN LATERAL (
+            SELECT * FROM orders
+            WHERE {" AND ".join(conditions)}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ${len(args)}
+        ) AS shop_orders
+        WHERE products.owner_id = $1
+        ORDER BY shop_orders.created_at DESC, shop_orders.id DESC
+        LIMIT ${len(args)}
         """
-        rows = await self.connection.fetch(query, shop_owner)
+        rows = await self.connection.fetch(query, *args)
+        rows, next_cursor = next_page(rows, limit)
         orders = [self._row_to_order(row) for row in rows]
-        return ListOrder(orders=orders)
+        return ListOrder(orders=orders, next_cursor=next_cursor)
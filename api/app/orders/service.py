@@ -1,6 +1,10 @@
-from datetime import timedelta
+from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
+from app.availability.repository import AvailabilityRepository
+from app.availability.service import AvailabilityService
+from app.deliveries.assignment import DeliveryLeg, get_assignment_strategy
 from app.deliveries.models import CreateDelivery, DeliveryType
 from app.deliveries.repository import DeliveryRepository
 from app.deliveries.service import DeliveryService
@@ -51,24 +55,15 @@ class OrderService:
         product = await ProductService(self.repository.connection).get_product(
             order_data.product_id
         )
-        orders = await self.repository.get_by_product_id(order_data.product_id)
-        count = product.available_quantity
-        for order in orders.orders:
-            if order.order_status == OrderStatus.CONFIRMED and (
-                order.rent_start_date - timedelta(days=1) <= order_data.rent_start_date
-                and order.rent_end_date >= order_data.rent_end_date - timedelta(days=1)
-            ):
-                count -= order.quantity
-            if (
-                order.order_status != OrderStatus.PICKED
-                or order.order_status != OrderStatus.CANCELLED
-                or order.order_status != OrderStatus.DRAFT
-            ) and (
-                order.rent_end_date + timedelta(days=1)
-            ) <= order_data.rent_start_date:
-                count += order.quantity
-        if count < order_data.quantity:
-            raise InsufficientStock()
+        available = await AvailabilityService(
+            AvailabilityRepository(self.repository.connection)
+        ).check(
+            order_data.product_id, order_data.rent_start_date, order_data.rent_end_date
+        )
+        if available < order_data.quantity:
+            raise InsufficientStock(
+                context={"available": available, "requested": order_data.quantity}
+            )
         item_total = order_data.quantity * product.price[order_data.rate]
         p_c = item_total * 0.05 if item_total > 1000 else item_total * 0.08
         s_t = item_total + p_c
@@ -86,33 +81,51 @@ class OrderService:
             await self.assign_order_to_delivery_partner(res)
         return res
 
-    async def get_orders(self, limit: int = 100, offset: int = 0) -> ListOrder:
+    async def get_orders(
+        self, limit: int = 100, cursor: Optional[str] = None, offset: int = 0
+    ) -> ListOrder:
         """Get all orders with pagination."""
-        return await self.repository.list(limit=limit, offset=offset)
+        return await self.repository.list(limit=limit, cursor=cursor, offset=offset)
 
     async def get_order(self, order_id: UUID) -> Order:
         """Get an order by ID."""
         return await self.repository.get_by_id(order_id)
 
     async def get_orders_by_user(
-        self, user_id: UUID, limit: int = 100, offset: int = 0
+        self,
+        user_id: UUID,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        offset: int = 0,
     ) -> ListOrder:
         """Get orders for a specific user."""
-        return await self.repository.get_by_user_id(user_id, limit=limit, offset=offset)
+        return await self.repository.get_by_user_id(
+            user_id, limit=limit, cursor=cursor, offset=offset
+        )
 
     async def get_orders_by_product(
-        self, product_id: UUID, limit: int = 100, offset: int = 0
+        self,
+        product_id: UUID,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        offset: int = 0,
     ) -> ListOrder:
         """Get orders for a specific product."""
         return await self.repository.get_by_product_id(
-            product_id, limit=limit, offset=offset
+            product_id, limit=limit, cursor=cursor, offset=offset
         )
 
     async def get_orders_by_status(
-        self, status: OrderStatus, limit: int = 100, offset: int = 0
+        self,
+        status: OrderStatus,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        offset: int = 0,
     ) -> ListOrder:
         """Get orders by status."""
-        return await self.repository.get_by_status(status, limit=limit, offset=offset)
+        return await self.repository.get_by_status(
+            status, limit=limit, cursor=cursor, offset=offset
+        )
 
     async def update_order_status(
         self, order_id: UUID, update_data: UpdateOrderStatus
@@ -307,35 +320,64 @@ class OrderService:
         else:
             return PaymentStatus.FULL
 
-    async def get_order_by_shop_owner(self, shop_owner: UUID) -> ListOrder:
+    async def get_order_by_shop_owner(
+        self,
+        shop_owner: UUID,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        status: Optional[OrderStatus] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+    ) -> ListOrder:
         """Get orders by shop owner with pagination"""
-        return await self.repository.get_order_by_shop_owner(shop_owner)
+        return await self.repository.get_order_by_shop_owner(
+            shop_owner,
+            limit=limit,
+            cursor=cursor,
+            status=status,
+            created_after=created_after,
+            created_before=created_before,
+        )
 
     async def assign_order_to_delivery_partner(self, order_data):
+        """
+        Creates the drop and pickup deliveries of an order, with partners
+        serving their pincodes chosen by the configured assignment strategy.
+        """
+        drop_pincode = order_data.delivery_location.pincode
+        pickup_pincode = order_data.pickup_location.pincode
         partners = await DeliveryPartnerService(
             DeliveryPartnerRepository(self.repository.connection)
-        ).get_delivery_partners()
-        drop_partner_id = None
-        pickup_partner_id = None
-        for partner in partners.delivery_partners:
-            if partner.address.pincode == order_data.delivery_location.pincode:
-                drop_partner_id = partner.id
-            if partner.address.pincode == order_data.pickup_location.pincode:
-                pickup_partner_id = partner.id
-        if drop_partner_id is None or pickup_partner_id is None:
+        ).get_partner_ids_by_pincodes([drop_pincode, pickup_pincode])
+        if not partners[drop_pincode] or not partners[pickup_pincode]:
             raise DeliveryServiceNotAvailable()
-        repo = DeliveryService(DeliveryRepository(self.repository.connection))
-        await repo.create_delivery(
-            CreateDelivery(
-                delivery_partner_id=drop_partner_id,
-                order_id=order_data.id,
-                delivery_type=DeliveryType.DROP,
-            )
+        delivery_repository = DeliveryRepository(self.repository.connection)
+        legs = [
+            DeliveryLeg(
+                DeliveryType.DROP, order_data.delivery_date, partners[drop_pincode]
+            ),
+            DeliveryLeg(
+                DeliveryType.PICKUP, order_data.pickup_date, partners[pickup_pincode]
+            ),
+        ]
+        chosen = await get_assignment_strategy().choose(
+            delivery_repository, order_data.id, legs
         )
-        await repo.create_delivery(
-            CreateDelivery(
-                delivery_partner_id=pickup_partner_id,
-                order_id=order_data.id,
-                delivery_type=DeliveryType.PICKUP,
+        if None in chosen:
+            raise DeliveryServiceNotAvailable(
+                detail="Every delivery partner for the specified locations is fully booked",
+                context={
+                    leg.delivery_type.value: str(leg.scheduled_at)
+                    for leg, partner_id in zip(legs, chosen)
+                    if partner_id is None
+                },
+            )
+        repo = DeliveryService(delivery_repository)
+        for leg, partner_id in zip(legs, chosen):
+            await repo.create_delivery(
+                CreateDelivery(
+                    delivery_partner_id=partner_id,
+                    order_id=order_data.id,
+                    delivery_type=leg.delivery_type,
+                )
             )
-        )
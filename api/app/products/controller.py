@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional
 from uuid import UUID
 
@@ -6,9 +7,13 @@ from fastapi import APIRouter, Depends, Query, UploadFile, status
 from magic import Magic
 from uuid_utils import uuid7
 
+from app.availability.exceptions import InvalidAvailabilityWindow
+from app.availability.models import Granularity, ProductAvailability
+from app.availability.repository import AvailabilityRepository
+from app.availability.service import AvailabilityService
 from app.base.exception_handler import http_exception_handler
 from app.base.exceptions import HTTPException
-from app.database import PgPool
+from app.database import LeasedRoute, PgPool
 from app.minio import MinioClient
 from app.products.exceptions import (
     InsufficientQuantity,
@@ -23,24 +28,28 @@ from app.products.service import ProductService
 from app.users.dependency import RequiresRole
 from app.users.models import UserType
 
-router = APIRouter(prefix="/products", tags=["products"])
+router = APIRouter(prefix="/products", tags=["products"], route_class=LeasedRoute)
 
 
 async def get_product_service(
     connection: asyncpg.Connection = Depends(PgPool.get_connection),
 ) -> ProductService:
     """Dependency to get ProductService with database connection"""
-    try:
-        yield ProductService(connection)
-    finally:
-        await connection.close()
+    yield ProductService(connection)
+
+
+async def get_availability_service(
+    connection: asyncpg.Connection = Depends(PgPool.get_connection),
+) -> AvailabilityService:
+    """Dependency to get AvailabilityService with database connection"""
+    yield AvailabilityService(AvailabilityRepository(connection))
 
 
 @router.post(
     "/",
     response_model=Product,
     status_code=status.HTTP_201_CREATED,
-    dependencies=[Depends(RequiresRole(UserType.ADMIN, UserType.SELLER))],
+    dependencies=[Depends(RequiresRole(UserType.ADMIN, UserType.SHOP_OWNER))],
 )
 async def create_product(
     product_data: CreateProduct,
@@ -76,10 +85,26 @@ async def create_product(
 async def get_products(
     owner_id: Optional[UUID] = Query(None, description="Filter by owner ID"),
     category_id: Optional[UUID] = Query(None, description="Filter by category ID"),
+    start: Optional[datetime] = Query(
+        None, description="Only products free from this time (requires end)"
+    ),
+    end: Optional[datetime] = Query(
+        None, description="Only products free until this time (requires start)"
+    ),
     service: ProductService = Depends(get_product_service),
 ) -> ListProduct:
     """Get all products with optional filtering."""
-    products = await service.list_products(owner_id=owner_id, category_id=category_id)
+    try:
+        products = await service.list_products(
+            owner_id=owner_id, category_id=category_id, start=start, end=end
+        )
+    except InvalidAvailabilityWindow as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                error=e,
+            )
+        )
     return ListProduct(products=products)
 
 
@@ -87,10 +112,24 @@ async def get_products(
 async def search_products(
     q: str = Query(..., description="Search term"),
     limit: int = Query(50, ge=1, le=100, description="Maximum number of results"),
+    start: Optional[datetime] = Query(
+        None, description="Only products free from this time (requires end)"
+    ),
+    end: Optional[datetime] = Query(
+        None, description="Only products free until this time (requires start)"
+    ),
     service: ProductService = Depends(get_product_service),
 ) -> ListProduct:
     """Search products by name."""
-    products = await service.search_products(q, limit)
+    try:
+        products = await service.search_products(q, limit, start=start, end=end)
+    except InvalidAvailabilityWindow as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                error=e,
+            )
+        )
     return ListProduct(products=products)
 
 
@@ -117,10 +156,37 @@ async def get_product(
         )
 
 
+@router.get("/{product_id}/availability", response_model=ProductAvailability)
+async def get_product_availability(
+    product_id: UUID,
+    start: datetime = Query(..., alias="from", description="Start of the window"),
+    end: datetime = Query(..., alias="to", description="End of the window"),
+    granularity: Granularity = Query(Granularity.DAY, description="Bucket size"),
+    service: AvailabilityService = Depends(get_availability_service),
+) -> ProductAvailability:
+    """Get the free quantity of a product for each day or hour of a window."""
+    try:
+        return await service.calendar(product_id, start, end, granularity)
+    except ProductNotFound as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                error=e,
+            )
+        )
+    except InvalidAvailabilityWindow as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                error=e,
+            )
+        )
+
+
 @router.put(
     "/{product_id}",
     response_model=Product,
-    dependencies=[Depends(RequiresRole(UserType.ADMIN, UserType.SELLER))],
+    dependencies=[Depends(RequiresRole(UserType.ADMIN, UserType.SHOP_OWNER))],
 )
 async def update_product(
     product_id: UUID,
@@ -180,7 +246,7 @@ async def update_product(
 @router.delete(
     "/{product_id}",
     status_code=status.HTTP_204_NO_CONTENT,
-    dependencies=[Depends(RequiresRole(UserType.ADMIN, UserType.SELLER))],
+    dependencies=[Depends(RequiresRole(UserType.ADMIN, UserType.SHOP_OWNER))],
 )
 async def delete_product(
     product_id: UUID, service: ProductService = Depends(get_product_service)
@@ -278,7 +344,7 @@ async def return_rental(
 
 @router.post(
     "/upload_images",
-    dependencies=[Depends(RequiresRole(UserType.ADMIN, UserType.SELLER))],
+    dependencies=[Depends(RequiresRole(UserType.ADMIN, UserType.SHOP_OWNER))],
 )
 async def upload_images(
     file: UploadFile,
@@ -288,7 +354,8 @@ async def upload_images(
     mime = Magic(mime=True)
     mime.from_file(file)
     print(f"File MIME type: {mime.mime_type}")
-    await client.put_object(
+    await MinioClient.upload(
+        client,
         bucket_name="products",
         object_name=file_id,
         data=file,
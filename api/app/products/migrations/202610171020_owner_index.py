@@ -0,0 +1,16 @@
+# List of dependencies (migration that must be applied before this one)
+dependencies = ["products.202508110646_initial"]
+
+# SQL to apply the migration
+apply = [
+    """--sql
+    CREATE INDEX idx_products_owner ON products(owner_id);
+    """,
+]
+
+# SQL to rollback the migration
+rollback = [
+    """--sql
+    DROP INDEX IF EXISTS idx_products_owner;
+    """,
+]
@@ -0,0 +1,23 @@
+# List of dependencies (migration that must be applied before this one)
+dependencies = ["products.202610171020_owner_index"]
+
+# SQL to apply the migration
+# Documents were stored as JSON strings holding the serialized document, they
+# are unwrapped while converting the columns to JSONB.
+apply = [
+    """--sql
+    ALTER TABLE products
+        ALTER COLUMN price TYPE JSONB USING CASE
+            WHEN json_typeof(price) = 'string' THEN (price #>> '{}')::jsonb
+            ELSE price::jsonb
+        END;
+    """,
+]
+
+# SQL to rollback the migration
+rollback = [
+    """--sql
+    ALTER TABLE products
+        ALTER COLUMN price TYPE JSON USING to_json(price::text);
+    """,
+]
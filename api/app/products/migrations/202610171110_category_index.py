@@ -0,0 +1,17 @@
+# List of dependencies (migration that must be applied before this one)
+dependencies = ["products.202610171030_jsonb"]
+
+# SQL to apply the migration
+apply = [
+    """--sql
+    CREATE INDEX idx_products_category_live ON products(category_id)
+    WHERE is_deleted = FALSE;
+    """,
+]
+
+# SQL to rollback the migration
+rollback = [
+    """--sql
+    DROP INDEX IF EXISTS idx_products_category_live;
+    """,
+]
@@ -1,19 +1,54 @@
-import json
+from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
 
 import asyncpg
 from uuid_utils.compat import uuid7
 
+from app.availability.repository import peak_load_cte
+from app.base.instrumentation import instrumented
+from app.config import Config
+from app.database import CacheEntity, InvalidationBus
 from app.products.exceptions import (
     InsufficientQuantity,
     InvalidPriceConfiguration,
     ProductDeleted,
     ProductNotFound,
 )
-from app.products.models import CreateProduct, Product, RentalUnit, UpdateProduct
+from app.products.models import CreateProduct, Product, UpdateProduct
+from app.utils.cache import TTLCache
 
+PRODUCT_COLUMNS = """
+    products.id, products.name, products.description, products.category_id,
+    products.owner_id, products.rental_units, products.price,
+    products.security_deposit, products.defect_charges, products.care_instruction,
+    products.total_quantity, products.available_quantity, products.reserved_quantity,
+    products.rented_quantity, products.images_id, products.is_deleted,
+    products.created_at
+"""
 
+
+config = Config()
+# Live products read by id. Every write below drops the entry of its product
+# and publishes it on the invalidation bus for the other workers, entries also
+# expire after PRODUCT_CACHE_TTL seconds. Cached models are shared between
+# requests and must not be mutated.
+product_cache: TTLCache[UUID, Product] = TTLCache(
+    maxsize=config.PRODUCT_CACHE_SIZE, ttl=config.PRODUCT_CACHE_TTL
+)
+
+
+def _on_product_invalidated(product_id: Optional[str]) -> None:
+    if product_id is None:
+        product_cache.clear()
+    else:
+        product_cache.pop(UUID(product_id))
+
+
+InvalidationBus.register(CacheEntity.PRODUCT, _on_product_invalidated)
+
+
+@instrumented
 class ProductRepository:
     def __init__(self, connection: asyncpg.Connection):
         self.connection = connection
@@ -38,7 +73,6 @@ class ProductRepository:
         """
         # Convert rental units to PostgreSQL array format
         rental_units_array = [unit.value for unit in product.rental_units]
-        price_json = json.dumps({k.value: v for k, v in product.price.items()})
 
         row = await self.connection.fetchrow(
             query,
@@ -48,7 +82,7 @@ class ProductRepository:
             product.category_id,
             product.owner_id,
             rental_units_array,
-            price_json,
+            product.price,
             product.security_deposit,
             product.defect_charges,
             product.care_instruction,
@@ -58,45 +92,39 @@ class ProductRepository:
             0,  # rented_quantity
             product.images_id,
         )
+        await InvalidationBus.publish(
+            self.connection, CacheEntity.CATEGORY, product.category_id
+        )
         return self._row_to_product(row)
 
     async def list(
-        self, owner_id: Optional[UUID] = None, category_id: Optional[UUID] = None
+        self,
+        owner_id: Optional[UUID] = None,
+        category_id: Optional[UUID] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
     ) -> List[Product]:
+        """
+        Lists products, optionally only those with free quantity over [start, end).
+        """
+        args: list = []
+        conditions = ["products.is_deleted = FALSE"]
         if owner_id:
-            query = """
-            SELECT id, name, description, category_id, owner_id, rental_units, price,
-                   security_deposit, defect_charges, care_instruction, total_quantity,
-                   available_quantity, reserved_quantity, rented_quantity, images_id,
-                   is_deleted, created_at
-            FROM products
-            WHERE owner_id = $1 AND is_deleted = FALSE
-            ORDER BY created_at DESC
-            """
-            rows = await self.connection.fetch(query, owner_id)
+            args.append(owner_id)
+            conditions.append(f"products.owner_id = ${len(args)}")
         elif category_id:
-            query = """
-            SELECT id, name, description, category_id, owner_id, rental_units, price,
-                   security_deposit, defect_charges, care_instruction, total_quantity,
-                   available_quantity, reserved_quantity, rented_quantity, images_id,
-                   is_deleted, created_at
-            FROM products
-            WHERE category_id = $1 AND is_deleted = FALSE
-            ORDER BY created_at DESC
-            """
-            rows = await self.connection.fetch(query, category_id)
-        else:
-            query = """
-            SELECT id, name, description, category_id, owner_id, rental_units, price,
-                   security_deposit, defect_charges, care_instruction, total_quantity,
-                   available_quantity, reserved_quantity, rented_quantity, images_id,
-                   is_deleted, created_at
-            FROM products
-            WHERE is_deleted = FALSE
-            ORDER BY created_at DESC
-            """
-            rows = await self.connection.fetch(query)
-
+            args.append(category_id)
+            conditions.append(f"products.category_id = ${len(args)}")
+        availability = self._availability_filter(args, start, end)
+        query = f"""
+        {availability["with"]}
+        SELECT {PRODUCT_COLUMNS}
+        FROM products
+        {availability["join"]}
+        WHERE {" AND ".join(conditions)} {availability["where"]}
+        ORDER BY products.created_at DESC
+        """
+        rows = await self.connection.fetch(query, *args)
         return [self._row_to_product(row) for row in rows]
 
     async def get_by_id(self, product_id: UUID) -> Product:
@@ -133,15 +161,20 @@ class ProductRepository:
                 care_instruction = $9,
                 total_quantity = $10,
                 images_id = $11
+            FROM (
+                SELECT category_id AS previous_category_id
+                FROM products
+                WHERE id = $1
+                FOR UPDATE
+            ) AS previous
             WHERE id = $1
             RETURNING id, name, description, category_id, owner_id, rental_units, price,
                  security_deposit, defect_charges, care_instruction, total_quantity,
                  available_quantity, reserved_quantity, rented_quantity, images_id,
-                 is_deleted, created_at;
+                 is_deleted, created_at, previous.previous_category_id;
         """
         # Convert rental units to PostgreSQL array format
         rental_units = [unit.value for unit in product.rental_units]
-        price_json = json.dumps({k.value: v for k, v in product.price.items()})
         row = await self.connection.fetchrow(
             query,
             product_id,
@@ -149,14 +182,27 @@ class ProductRepository:
             product.description,
             product.category_id,
             rental_units,
-            price_json,
+            product.price,
             product.security_deposit,
             product.defect_charges,
             product.care_instruction,
             product.total_quantity,
             product.images_id,
         )
+        product_cache.pop(product_id)
         if row is not None:
+            await InvalidationBus.publish(
+                self.connection, CacheEntity.PRODUCT, product_id
+            )
+            if (
+                row["previous_category_id"] != row["category_id"]
+                and not row["is_deleted"]
+            ):
+                # The product moved, both product counts changed
+                for category_id in (row["previous_category_id"], row["category_id"]):
+                    await InvalidationBus.publish(
+                        self.connection, CacheEntity.CATEGORY, category_id
+                    )
             return self._row_to_product(row)
         else:
             raise ProductNotFound(context={"product_id": str(product_id)})
@@ -166,10 +212,16 @@ class ProductRepository:
         UPDATE products
         SET is_deleted = TRUE
         WHERE id = $1 AND is_deleted = FALSE
+        RETURNING category_id
         """
-        result = await self.connection.execute(query, product_id)
-        if result == "UPDATE 0":
+        row = await self.connection.fetchrow(query, product_id)
+        product_cache.pop(product_id)
+        if row is None:
             raise ProductNotFound(context={"product_id": str(product_id)})
+        await InvalidationBus.publish(self.connection, CacheEntity.PRODUCT, product_id)
+        await InvalidationBus.publish(
+            self.connection, CacheEntity.CATEGORY, row["category_id"]
+        )
 
     async def confirm_rental(self, product_id: UUID, quantity: int) -> Product:
         query = """
@@ -183,12 +235,14 @@ class ProductRepository:
                  is_deleted, created_at
         """
         row = await self.connection.fetchrow(query, product_id, quantity)
+        product_cache.pop(product_id)
         if not row:
             await self.get_by_id(product_id)
             raise InsufficientQuantity(
                 context={"product_id": str(product_id), "requested_quantity": quantity}
             )
 
+        await InvalidationBus.publish(self.connection, CacheEntity.PRODUCT, product_id)
         return self._row_to_product(row)
 
     async def return_rental(self, product_id: UUID, quantity: int) -> Product:
@@ -203,56 +257,58 @@ class ProductRepository:
                  is_deleted, created_at
         """
         row = await self.connection.fetchrow(query, product_id, quantity)
+        product_cache.pop(product_id)
         if not row:
             await self.get_by_id(product_id)
             raise InsufficientQuantity(
                 context={"product_id": str(product_id), "return_quantity": quantity}
             )
 
+        await InvalidationBus.publish(self.connection, CacheEntity.PRODUCT, product_id)
         return self._row_to_product(row)
 
-    async def search_by_name(self, search_term: str, limit: int = 50) -> List[Product]:
-        query = """
-        SELECT id, name, description, category_id, owner_id, rental_units, price,
-               security_deposit, defect_charges, care_instruction, total_quantity,
-               available_quantity, reserved_quantity, rented_quantity, images_id,
-               is_deleted, created_at
+    async def search_by_name(
+        self,
+        search_term: str,
+        limit: int = 50,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[Product]:
+        args: list = [search_term, limit]
+        availability = self._availability_filter(args, start, end)
+        query = f"""
+        {availability["with"]}
+        SELECT {PRODUCT_COLUMNS}
         FROM products
-        WHERE to_tsvector('english', name) @@ plainto_tsquery('english', $1)
-          AND is_deleted = FALSE
-        ORDER BY ts_rank(to_tsvector('english', name), plainto_tsquery('english', $1)) DESC
+        {availability["join"]}
+        WHERE to_tsvector('english', products.name) @@ plainto_tsquery('english', $1)
+          AND products.is_deleted = FALSE {availability["where"]}
+        ORDER BY ts_rank(
+            to_tsvector('english', products.name), plainto_tsquery('english', $1)
+        ) DESC
         LIMIT $2
         """
-        rows = await self.connection.fetch(query, search_term, limit)
+        rows = await self.connection.fetch(query, *args)
         return [self._row_to_product(row) for row in rows]
 
-    def _row_to_product(self, row) -> Product:
-        # Convert rental_units array back to enum list
-        rental_units = [RentalUnit(unit) for unit in row["rental_units"]]
-
-        # Parse price JSON and convert keys back to RentalUnit enums
-        price_dict = json.loads(row["price"])
-        # price = {RentalUnit(k): v for k, v in price_dict.items()}
-
-        # Convert image IDs back to UUIDs
-        # images_id = [UUID(img_id) for img_id in row["images_id"]]
+    def _availability_filter(
+        self, args: list, start: Optional[datetime], end: Optional[datetime]
+    ) -> dict[str, str]:
+        """
+        SQL fragments restricting a product query to products with free quantity
+        over [start, end). The active rentals overlapping the window are
+        aggregated per product once and joined, instead of checking each product.
+        The window bounds are appended to `args`.
+        """
+        if start is None or end is None:
+            return {"with": "", "join": "", "where": ""}
+        args.extend((start, end))
+        start_arg, end_arg = f"${len(args) - 1}", f"${len(args)}"
+        return {
+            "with": f"WITH {peak_load_cte(start_arg, end_arg)}",
+            "join": "LEFT JOIN peak_load ON peak_load.product_id = products.id",
+            "where": "AND products.total_quantity - coalesce(peak_load.peak, 0) > 0",
+        }
 
-        return Product(
-            id=row["id"],
-            name=row["name"],
-            description=row["description"],
-            category_id=row["category_id"],
-            owner_id=row["owner_id"],
-            rental_units=rental_units,
-            price=price_dict,
-            security_deposit=row["security_deposit"],
-            defect_charges=row["defect_charges"],
-            care_instruction=row["care_instruction"],
-            total_quantity=row["total_quantity"],
-            available_quantity=row["available_quantity"],
-            reserved_quantity=row["reserved_quantity"],
-            rented_quantity=row["rented_quantity"],
-            images_id=row["images_id"],
-            is_deleted=row["is_deleted"],
-            created_at=row["created_at"],
-        )
+    def _row_to_product(self, row) -> Product:
+        return Product.model_validate(dict(row))
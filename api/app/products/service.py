@@ -1,8 +1,10 @@
+from datetime import datetime, timezone
 from typing import List, Optional
 from uuid import UUID
 
 import asyncpg
 
+from app.availability.exceptions import InvalidAvailabilityWindow
 from app.products.exceptions import (
     InsufficientQuantity,
     InvalidPriceConfiguration,
@@ -10,7 +12,7 @@ from app.products.exceptions import (
     ProductDeleted,
 )
 from app.products.models import CreateProduct, Product, RentalUnit, UpdateProduct
-from app.products.repository import ProductRepository
+from app.products.repository import ProductRepository, product_cache
 
 
 class ProductService:
@@ -31,18 +33,32 @@ class ProductService:
 
         return await self.repository.create(product)
 
-    async def get_product(self, product_id: UUID) -> Product:
-        """Get a product by ID"""
-        product = await self.repository.get_by_id(product_id)
+    async def get_product(self, product_id: UUID, consistent: bool = False) -> Product:
+        """
+        Get a product by ID, from the product cache unless `consistent` is set.
+        Cached quantities may lag behind writes made by other processes, so
+        paths acting on them read with `consistent=True`.
+        """
+        product = None if consistent else product_cache.get(product_id)
+        if product is None:
+            product = await self.repository.get_by_id(product_id)
+            product_cache.set(product_id, product)
         if product.is_deleted:
             raise ProductDeleted(context={"product_id": str(product_id)})
         return product
 
     async def list_products(
-        self, owner_id: Optional[UUID] = None, category_id: Optional[UUID] = None
+        self,
+        owner_id: Optional[UUID] = None,
+        category_id: Optional[UUID] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
     ) -> List[Product]:
         """List products with optional filtering"""
-        return await self.repository.list(owner_id=owner_id, category_id=category_id)
+        start, end = self._validate_window(start, end)
+        return await self.repository.list(
+            owner_id=owner_id, category_id=category_id, start=start, end=end
+        )
 
     async def update_product(
         self, product_id: UUID, update_data: UpdateProduct, requester_owner_id: UUID
@@ -53,7 +69,7 @@ class ProductService:
     async def delete_product(self, product_id: UUID) -> None:
         """Soft delete a product with ownership validation"""
         # Get current product to check ownership
-        current_product = await self.get_product(product_id)
+        current_product = await self.get_product(product_id, consistent=True)
         # Check if product can be deleted (no active rentals)
         if current_product.rented_quantity > 0:
             raise InsufficientQuantity(
@@ -66,13 +82,22 @@ class ProductService:
 
         await self.repository.delete(product_id)
 
-    async def search_products(self, search_term: str, limit: int) -> List[Product]:
+    async def search_products(
+        self,
+        search_term: str,
+        limit: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[Product]:
         """Search products by name using full-text search"""
-        return await self.repository.search_by_name(search_term, limit=50)
+        start, end = self._validate_window(start, end)
+        return await self.repository.search_by_name(
+            search_term, limit=limit, start=start, end=end
+        )
 
     async def confirm_rental(self, product_id: UUID, quantity: int) -> Product:
         """Move quantity from reserved to rented"""
-        product = await self.get_product(product_id)
+        product = await self.get_product(product_id, consistent=True)
 
         if product.available_quantity < quantity:
             raise InsufficientQuantity(
@@ -91,7 +116,7 @@ class ProductService:
 
     async def return_rental(self, product_id: UUID, quantity: int) -> Product:
         """Return rented quantity back to available"""
-        product = await self.get_product(product_id)
+        product = await self.get_product(product_id, consistent=True)
 
         if product.rented_quantity < quantity:
             raise InsufficientQuantity(
@@ -126,6 +151,29 @@ class ProductService:
 
         return product.price.get(rental_unit, 0.0)
 
+    def _validate_window(
+        self, start: Optional[datetime], end: Optional[datetime]
+    ) -> tuple[Optional[datetime], Optional[datetime]]:
+        """
+        Validate that an availability window is either complete and non-empty or
+        absent. Bounds without an offset are taken as UTC.
+        """
+        if start is None and end is None:
+            return start, end
+        if start is not None and start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        if end is not None and end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+        if start is None or end is None or start >= end:
+            raise InvalidAvailabilityWindow(
+                detail="Both start and end are required and start must be before end",
+                context={
+                    "start": start.isoformat() if start else None,
+                    "end": end.isoformat() if end else None,
+                },
+            )
+        return start, end
+
     def _validate_price_configuration(
         self, rental_units: List[RentalUnit], price: dict[RentalUnit, float]
     ) -> None:
@@ -1,22 +1,124 @@
+from datetime import datetime
+from random import random
+from typing import Any, Optional
+
 import sentry_sdk
+from starlette.routing import compile_path
+
 from app.config import Config
+from app.utils.metrics import Counter
+
+# Transactions kept or dropped, by route and reason
+sampling_decisions = Counter("route", "decision")
+
+# Span statuses of requests that failed on our side
+ERROR_STATUSES = {"internal_error", "unknown_error", "unavailable", "deadline_exceeded"}
+
+
+def _route(event: dict[str, Any]) -> str:
+    method = (event.get("request") or {}).get("method", "")
+    return f"{method} {event.get('transaction', '')}".strip()
+
+
+def _status_code(event: dict[str, Any]) -> Optional[int]:
+    status_code = (event.get("tags") or {}).get("http.status_code")
+    return int(status_code) if status_code else None
+
+
+def _duration(event: dict[str, Any]) -> float:
+    """Duration of a transaction event, whose timestamps are ISO strings."""
+    start, end = event.get("start_timestamp"), event.get("timestamp")
+    if not start or not end:
+        return 0.0
+    return (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()
+
+
+class TransactionSampler:
+    """
+    Samples request transactions by route and outcome.
+
+    Health checks are never traced. Routes listed in
+    `SENTRY_TRACES_ROUTE_RATES` are sampled when the request starts, at their
+    rate, so requests left out of the sample pay no tracing or profiling cost;
+    the tradeoff is that their failed or slow requests are only kept when they
+    fell in the sample. Every other request is traced and kept when it failed
+    or was slow, otherwise at `SENTRY_TRACES_SAMPLE_RATE`, as its outcome is
+    only known once the transaction finished.
+    """
+
+    def __init__(self, config: Config):
+        self.ignored_paths = set(config.SENTRY_IGNORED_PATHS)
+        self.sample_rate = config.SENTRY_TRACES_SAMPLE_RATE
+        self.route_rates = config.SENTRY_TRACES_ROUTE_RATES
+        self.slow_transaction = config.SENTRY_SLOW_TRANSACTION
+        # (method, path pattern, route, rate), routes without parameters first
+        # so "/products/search" is not taken for "/products/{product_id}"
+        self.route_patterns = []
+        for route, rate in self.route_rates.items():
+            method, _, template = route.partition(" ")
+            pattern = compile_path(template)[0]
+            self.route_patterns.append((method, pattern, route, rate))
+        self.route_patterns.sort(key=lambda entry: "{" in entry[2])
+
+    def _head_rate(self, method: str, path: str) -> Optional[tuple[str, float]]:
+        """Route and rate of a request to a route sampled when it starts."""
+        for route_method, pattern, route, rate in self.route_patterns:
+            if route_method == method and pattern.match(path):
+                return route, rate
+        return None
+
+    def traces_sampler(self, sampling_context: dict[str, Any]) -> float:
+        scope = sampling_context.get("asgi_scope") or {}
+        path = scope.get("path")
+        if path in self.ignored_paths:
+            sampling_decisions.inc(path, "ignored")
+            return 0.0
+        head = self._head_rate(scope.get("method", ""), path or "")
+        if head is not None:
+            route, rate = head
+            if random() >= rate:
+                sampling_decisions.inc(route, "dropped")
+                return 0.0
+        return 1.0
+
+    def before_send_transaction(
+        self, event: dict[str, Any], hint: dict[str, Any]
+    ) -> Optional[dict[str, Any]]:
+        route = _route(event)
+        status_code = _status_code(event)
+        status = ((event.get("contexts") or {}).get("trace") or {}).get("status")
+        if (status_code is not None and status_code >= 500) or (
+            status in ERROR_STATUSES
+        ):
+            decision = "error"
+        elif _duration(event) >= self.slow_transaction:
+            decision = "slow"
+        elif route in self.route_rates:
+            # Already sampled when the request started
+            decision = "sampled"
+        else:
+            decision = "sampled" if random() < self.sample_rate else "dropped"
+        sampling_decisions.inc(route, decision)
+        return None if decision == "dropped" else event
+
 
 def init_sdk():
+    config = Config()
+    sampler = TransactionSampler(config)
     sentry_sdk.init(
-        dsn=Config().SENTRY_URL,
+        dsn=config.SENTRY_URL,
         # Add data like request headers and IP for users, if applicable;
         # see https://docs.sentry.io/platforms/python/data-management/data-collected/ for more info
         send_default_pii=True,
-        # Set traces_sample_rate to 1.0 to capture 100%
-        # of transactions for tracing.
-        traces_sample_rate=1.0,
-        # To collect profiles for all profile sessions,
-        # set `profile_session_sample_rate` to 1.0.
-        profile_session_sample_rate=1.0,
+        # Requests are traced by route and kept depending on their outcome,
+        # see `TransactionSampler`.
+        traces_sampler=sampler.traces_sampler,
+        before_send_transaction=sampler.before_send_transaction,
+        # Share of the processes profiling the requests they trace.
+        profile_session_sample_rate=config.SENTRY_PROFILE_SESSION_SAMPLE_RATE,
         # Profiles will be automatically collected while
         # there is an active span.
         profile_lifecycle="trace",
-
         # Enable logs to be sent to Sentry
         _experiments={
             "enable_logs": True,
@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, status
 
 from app.base.exception_handler import http_exception_handler
 from app.base.exceptions import HTTPException
-from app.database import PgPool
+from app.database import LeasedRoute, PgPool
 from app.shop_owner.exceptions import (
     ShopOwnerAlreadyExists,
     ShopOwnerGSTAlreadyExists,
@@ -21,18 +21,15 @@ from app.shop_owner.repository import ShopOwnerRepository
 from app.shop_owner.service import ShopOwnerService
 from app.users.dependency import get_current_user
 
-router = APIRouter(prefix="/shop-owners", tags=["shop-owners"])
+router = APIRouter(prefix="/shop-owners", tags=["shop-owners"], route_class=LeasedRoute)
 
 
 async def get_shop_owner_service(
     connection: asyncpg.Connection = Depends(PgPool.get_connection),
 ) -> ShopOwnerService:
     """Dependency to get ShopOwnerService with database connection"""
-    try:
-        repository = ShopOwnerRepository(connection)
-        yield ShopOwnerService(repository)
-    finally:
-        await connection.close()
+    repository = ShopOwnerRepository(connection)
+    yield ShopOwnerService(repository)
 
 
 @router.post("/", response_model=ShopOwner, status_code=status.HTTP_201_CREATED)
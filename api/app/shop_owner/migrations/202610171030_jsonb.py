@@ -0,0 +1,28 @@
+# List of dependencies (migration that must be applied before this one)
+dependencies = ["shop_owner.202508110618_initial"]
+
+# SQL to apply the migration
+# Documents were stored as JSON strings holding the serialized document, they
+# are unwrapped while converting the columns to JSONB.
+apply = [
+    """--sql
+    ALTER TABLE shop_owner
+        ALTER COLUMN address TYPE JSONB USING CASE
+            WHEN json_typeof(address) = 'string' THEN (address #>> '{}')::jsonb
+            ELSE address::jsonb
+        END,
+        ALTER COLUMN bank_details TYPE JSONB USING CASE
+            WHEN json_typeof(bank_details) = 'string' THEN (bank_details #>> '{}')::jsonb
+            ELSE bank_details::jsonb
+        END;
+    """,
+]
+
+# SQL to rollback the migration
+rollback = [
+    """--sql
+    ALTER TABLE shop_owner
+        ALTER COLUMN address TYPE JSON USING to_json(address::text),
+        ALTER COLUMN bank_details TYPE JSON USING to_json(bank_details::text);
+    """,
+]
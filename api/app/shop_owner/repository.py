@@ -2,20 +2,21 @@ from uuid import UUID
 
 import asyncpg
 
+from app.base.instrumentation import instrumented
+from app.database import CacheEntity, InvalidationBus
+from app.delivery_partner.repository import (
+    DELETED_PARTNER_PINCODE,
+    drop_pincode_partners,
+)
 from app.shop_owner.exceptions import (
     ShopOwnerAlreadyExists,
     ShopOwnerGSTAlreadyExists,
     ShopOwnerNotFound,
 )
-from app.shop_owner.models import (
-    Address,
-    BankDetails,
-    CreateShopOwner,
-    ShopOwner,
-    UpdateShopOwner,
-)
+from app.shop_owner.models import CreateShopOwner, ShopOwner, UpdateShopOwner
 
 
+@instrumented
 class ShopOwnerRepository:
     def __init__(self, connection: asyncpg.Connection):
         self.connection = connection
@@ -33,18 +34,10 @@ class ShopOwnerRepository:
                 shop_owner.name,
                 shop_owner.owner_name,
                 shop_owner.gst_no,
-                shop_owner.address.model_dump_json(),
-                shop_owner.bank_details.model_dump_json(),
-            )
-            return ShopOwner(
-                id=row["id"],
-                name=row["name"],
-                owner_name=row["owner_name"],
-                gst_no=row["gst_no"],
-                address=Address.model_validate_json(row["address"]),
-                bank_details=BankDetails.model_validate_json(row["bank_details"]),
-                created_at=row["created_at"],
+                shop_owner.address,
+                shop_owner.bank_details,
             )
+            return ShopOwner.model_validate(dict(row))
         except asyncpg.UniqueViolationError:
             raise ShopOwnerAlreadyExists(context={"gst_no": shop_owner.gst_no})
         except asyncpg.ForeignKeyViolationError:
@@ -62,18 +55,7 @@ class ShopOwnerRepository:
         WHERE is_deleted = FALSE
         """
         rows = await self.connection.fetch(query)
-        return [
-            ShopOwner(
-                id=row["id"],
-                name=row["name"],
-                owner_name=row["owner_name"],
-                gst_no=row["gst_no"],
-                address=Address.model_validate_json(row["address"]),
-                bank_details=BankDetails.model_validate_json(row["bank_details"]),
-                created_at=row["created_at"],
-            )
-            for row in rows
-        ]
+        return [ShopOwner.model_validate(dict(row)) for row in rows]
 
     async def get_by_id(self, shop_owner_id: UUID) -> ShopOwner:
         query = """
@@ -83,15 +65,7 @@ class ShopOwnerRepository:
         """
         row = await self.connection.fetchrow(query, shop_owner_id)
         if row:
-            return ShopOwner(
-                id=row["id"],
-                name=row["name"],
-                owner_name=row["owner_name"],
-                gst_no=row["gst_no"],
-                address=Address.model_validate_json(row["address"]),
-                bank_details=BankDetails.model_validate_json(row["bank_details"]),
-                created_at=row["created_at"],
-            )
+            return ShopOwner.model_validate(dict(row))
         raise ShopOwnerNotFound(context={"shop_owner_id": str(shop_owner_id)})
 
     async def get_by_gst_no(self, gst_no: str) -> ShopOwner:
@@ -102,15 +76,7 @@ class ShopOwnerRepository:
         """
         row = await self.connection.fetchrow(query, gst_no)
         if row:
-            return ShopOwner(
-                id=row["id"],
-                name=row["name"],
-                owner_name=row["owner_name"],
-                gst_no=row["gst_no"],
-                address=Address.model_validate_json(row["address"]),
-                bank_details=BankDetails.model_validate_json(row["bank_details"]),
-                created_at=row["created_at"],
-            )
+            return ShopOwner.model_validate(dict(row))
         raise ShopOwnerNotFound(context={"gst_no": gst_no})
 
     async def update(self, id: UUID, shop_owner: UpdateShopOwner) -> ShopOwner:
@@ -127,29 +93,26 @@ class ShopOwnerRepository:
                 shop_owner.name,
                 shop_owner.owner_name,
                 shop_owner.gst_no,
-                shop_owner.address.model_dump_json(),
-                shop_owner.bank_details.model_dump_json(),
+                shop_owner.address,
+                shop_owner.bank_details,
             )
             if row:
-                return ShopOwner(
-                    id=row["id"],
-                    name=row["name"],
-                    owner_name=row["owner_name"],
-                    gst_no=row["gst_no"],
-                    address=Address.model_validate_json(row["address"]),
-                    bank_details=BankDetails.model_validate_json(row["bank_details"]),
-                    created_at=row["created_at"],
-                )
+                return ShopOwner.model_validate(dict(row))
             raise ShopOwnerNotFound(context={"shop_owner_id": str(id)})
         except asyncpg.UniqueViolationError:
             raise ShopOwnerGSTAlreadyExists(context={"gst_no": shop_owner.gst_no})
 
     async def delete(self, shop_owner_id: UUID) -> None:
-        query = """
+        query = f"""
         UPDATE users
         SET is_deleted = TRUE
         WHERE id = $1
+        RETURNING {DELETED_PARTNER_PINCODE}
         """
-        result = await self.connection.execute(query, shop_owner_id)
-        if result == "UPDATE 0":
+        row = await self.connection.fetchrow(query, shop_owner_id)
+        if row is None:
             raise ShopOwnerNotFound(context={"shop_owner_id": str(shop_owner_id)})
+        await InvalidationBus.publish(
+            self.connection, CacheEntity.USER_TOKENS, shop_owner_id
+        )
+        await drop_pincode_partners(self.connection, row["partner_pincode"])
@@ -8,6 +8,7 @@ from app.shop_owner.models import (
     UpdateShopOwner,
 )
 from app.shop_owner.repository import ShopOwnerRepository
+from app.users.dependency import revoke_tokens
 
 
 class ShopOwnerService:
@@ -72,6 +73,7 @@ class ShopOwnerService:
         # Check if shop owner exists before deletion
         await self.repository.get_by_id(shop_owner_id)
         await self.repository.delete(shop_owner_id)
+        revoke_tokens(shop_owner_id)
 
     async def shop_owner_exists(self, shop_owner_id: UUID) -> bool:
         """
@@ -6,9 +6,11 @@ from fastapi import APIRouter, Depends, Query, status
 from structlog import get_logger
 
 from app.base.exception_handler import http_exception_handler
-from app.base.exceptions import HTTPException
-from app.database import PgPool
+from app.base.exceptions import HTTPException, InvalidCursor
+from app.database import LeasedRoute, PgPool
+from app.shop_owner.exceptions import ShopOwnerAlreadyExists
 from app.users.dependency import RequiresRole, get_current_user
+from app.utils.argon2 import PasswordHasherSaturated
 
 from .exceptions import (
     EmailAlreadyExistsException,
@@ -28,7 +30,7 @@ from .service import UserService
 
 logger = get_logger(__name__)
 
-router = APIRouter(prefix="/users", tags=["Users"])
+router = APIRouter(prefix="/users", tags=["Users"], route_class=LeasedRoute)
 
 
 async def get_user_service(
@@ -36,7 +38,6 @@ async def get_user_service(
 ) -> UserService:
     """Dependency to get UserService with database connection"""
     yield UserService(connection)
-    await connection.close()
 
 
 @router.post(
@@ -67,6 +68,20 @@ async def create_user(
                 error=e,
             )
         )
+    except ShopOwnerAlreadyExists as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                error=e,
+            )
+        )
+    except PasswordHasherSaturated as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                error=e,
+            )
+        )
 
 
 @router.post(
@@ -89,6 +104,13 @@ async def login_user(
                 error=e,
             )
         )
+    except PasswordHasherSaturated as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                error=e,
+            )
+        )
 
 
 @router.get(
@@ -99,21 +121,37 @@ async def login_user(
     dependencies=[Depends(RequiresRole(UserType.ADMIN))],
 )
 async def list_users(
-    page: int = Query(1, ge=1, description="Page number"),
+    page: int = Query(
+        1, ge=1, deprecated=True, description="Use cursor, which is faster"
+    ),
     page_size: int = Query(10, ge=1, le=100, description="Number of users per page"),
     user_type: Optional[UserType] = Query(None, description="Filter by user type"),
     include_deleted: bool = Query(False, description="Include soft-deleted users"),
     search: Optional[str] = Query(None, description="Search in email or mobile number"),
+    cursor: Optional[str] = Query(None, description="Cursor of the page to fetch"),
+    exact_count: bool = Query(
+        False, description="Count the users exactly instead of estimating the total"
+    ),
     user_service: UserService = Depends(get_user_service),
 ) -> UserListResponse:
-    """List users with pagination and filtering"""
-    return await user_service.list_users(
-        page=page,
-        page_size=page_size,
-        user_type=user_type,
-        include_deleted=include_deleted,
-        search=search,
-    )
+    """List users with keyset pagination and filtering"""
+    try:
+        return await user_service.list_users(
+            page=page,
+            page_size=page_size,
+            user_type=user_type,
+            include_deleted=include_deleted,
+            search=search,
+            cursor=cursor,
+            exact_count=exact_count,
+        )
+    except InvalidCursor as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                error=e,
+            )
+        )
 
 
 @router.get(
@@ -226,6 +264,13 @@ async def update_password(
                 error=e,
             )
         )
+    except PasswordHasherSaturated as e:
+        return http_exception_handler(
+            HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                error=e,
+            )
+        )
 
 
 @router.delete(
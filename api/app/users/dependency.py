@@ -1,29 +1,99 @@
+from datetime import datetime
+from hashlib import blake2b
+from time import time
 from typing import Annotated, Optional
+from uuid import UUID
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pyseto import VerifyError
 
+from app.config import Config
+from app.database import CacheEntity, InvalidationBus
 from app.users.models import UserPayload, UserType
+from app.utils.cache import TTLCache
 from app.utils.paseto import verify_token
 
+config = Config()
 bearer = HTTPBearer(auto_error=False)
 
+# Decoded tokens keyed by their digest, each kept until the token expires.
+# Values are (issued at, payload), expiry uses the wall clock like `exp`.
+token_cache: TTLCache[bytes, tuple[float, UserPayload]] = TTLCache(
+    maxsize=config.TOKEN_CACHE_SIZE, clock=time
+)
+# Users whose tokens issued before the stored time are no longer accepted.
+# Entries outlive every token they could apply to.
+revocations: TTLCache[UUID, float] = TTLCache(
+    maxsize=config.TOKEN_CACHE_SIZE, ttl=config.PASETO_EXP, clock=time
+)
+
+
+def decode_token(token: str) -> UserPayload:
+    """
+    Decodes a bearer token, reusing the result of previous requests made with
+    the same token while it is valid.
+
+    Raises:
+        VerifyError: If the token is invalid, expired or revoked
+    """
+    digest = blake2b(token.encode(), digest_size=16).digest()
+    cached = token_cache.get(digest)
+    if cached is None:
+        payload = verify_token(token)
+        expires_at = datetime.fromisoformat(payload["exp"]).timestamp()
+        cached = (expires_at - config.PASETO_EXP, UserPayload(**payload))
+        token_cache.set(digest, cached, ttl=expires_at - time())
+    issued_at, user = cached
+    revoked_at = revocations.get(user.id)
+    if revoked_at is not None and issued_at <= revoked_at:
+        token_cache.pop(digest)
+        raise VerifyError("Token revoked.")
+    return user
+
+
+def revoke_tokens(user_id: UUID) -> None:
+    """Rejects every token issued to a user so far."""
+    revocations.set(user_id, time())
+
+
+def _on_tokens_invalidated(user_id: Optional[str]) -> None:
+    if user_id is not None:
+        revoke_tokens(UUID(user_id))
+    else:
+        # Revocations missed while disconnected cannot be recovered, tokens
+        # are at least verified again
+        token_cache.clear()
+
+
+InvalidationBus.register(CacheEntity.USER_TOKENS, _on_tokens_invalidated)
+
 
 async def get_current_user(
+    request: Request,
     credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(bearer)],
 ) -> UserPayload:
+    """
+    Authenticated user of the request. Used in `dependencies` it only marks the
+    route as requiring authentication, which `AuthMiddleware` enforces.
+    """
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
     if credentials is None or credentials.credentials is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     try:
-        payload = verify_token(credentials.credentials)
-
+        return decode_token(credentials.credentials)
     except VerifyError:
         raise HTTPException(status_code=401, detail="Invalid token")
-    return UserPayload(**payload)
 
 
 class RequiresRole:
+    """
+    Marks a route as restricted to the given roles. Enforced by `AuthMiddleware`
+    when used in the `dependencies` of a route or router.
+    """
+
     def __init__(self, *required_role: UserType):
         self.required_roles = required_role
 
@@ -0,0 +1,31 @@
+# List of dependencies (migration that must be applied before this one)
+dependencies = ["users.202508110605_initial"]
+
+# SQL to apply the migration
+apply = [
+    """--sql
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    """,
+    """--sql
+    CREATE INDEX idx_users_email_id_trgm ON users USING gin (email_id gin_trgm_ops);
+    """,
+    """--sql
+    CREATE INDEX idx_users_mobile_no_trgm ON users USING gin (mobile_no gin_trgm_ops);
+    """,
+    """--sql
+    CREATE INDEX idx_users_created ON users(created_at DESC, id DESC);
+    """,
+]
+
+# SQL to rollback the migration
+rollback = [
+    """--sql
+    DROP INDEX IF EXISTS idx_users_created;
+    """,
+    """--sql
+    DROP INDEX IF EXISTS idx_users_mobile_no_trgm;
+    """,
+    """--sql
+    DROP INDEX IF EXISTS idx_users_email_id_trgm;
+    """,
+]
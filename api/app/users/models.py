@@ -1,5 +1,6 @@
 from datetime import datetime
 from enum import Enum
+from typing import Optional
 from uuid import UUID
 
 from pydantic import BaseModel, EmailStr, Field
@@ -67,8 +68,14 @@ class UserListResponse(BaseModel):
 
     users: list[UserResponse]
     total: int
+    total_is_estimate: bool = Field(
+        False, description="Whether total is the planner's estimate"
+    )
     page: int
     page_size: int
+    next_cursor: Optional[str] = Field(
+        None, description="Cursor of the next page, absent on the last page"
+    )
 
 
 class UserPasswordUpdate(BaseModel):
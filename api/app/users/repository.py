@@ -1,44 +1,78 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 from uuid import UUID, uuid4
 
 import asyncpg
 from pydantic_extra_types.phone_numbers import PhoneNumber
 from structlog import get_logger
 
+from app.base.instrumentation import instrumented
+from app.base.pagination import keyset_condition, next_page
+from app.customers.models import CreateCustomer
+from app.database import CacheEntity, InvalidationBus
+from app.delivery_partner.models import CreateDeliveryPartner
+from app.delivery_partner.repository import (
+    DELETED_PARTNER_PINCODE,
+    drop_pincode_partners,
+)
+from app.shop_owner.exceptions import ShopOwnerAlreadyExists
+from app.shop_owner.models import CreateShopOwner
+
 from .exceptions import EmailAlreadyExistsException, MobileNumberAlreadyExistsException
 from .models import UserCreate, UserInDB, UserResponse, UserType
 
+# Role specific profile created along with a user
+Profile = Union[CreateCustomer, CreateDeliveryPartner, CreateShopOwner]
+
 
+@instrumented
 class UserRepository:
     def __init__(self, connection: asyncpg.Connection):
         self.connection = connection
 
-    async def create_user(self, user_data: UserCreate) -> UserInDB:
-        """Create a new user in the database"""
-        query = """
-            INSERT INTO users (id, email_id, mobile_no, password, user_type)
-            VALUES ($1, $2, $3, $4, $5)
-            RETURNING id, email_id, mobile_no, password, user_type, is_deleted, created_at
+    async def create_user(
+        self,
+        user_data: UserCreate,
+        user_id: Optional[UUID] = None,
+        profile: Optional[Profile] = None,
+    ) -> UserInDB:
+        """
+        Create a new user in the database, along with the profile of its role.
+
+        Both rows are inserted by a single statement, so either both exist
+        afterwards or none does.
+        """
+        args = [
+            user_id or uuid4(),
+            user_data.email_id,
+            str(user_data.mobile_no),
+            user_data.password,
+            user_data.user_type.value,
+        ]
+        profile_insert = self._profile_insert(profile, args)
+        query = f"""
+            WITH new_user AS (
+                INSERT INTO users (id, email_id, mobile_no, password, user_type)
+                VALUES ($1, $2, $3, $4, $5)
+                RETURNING id, email_id, mobile_no, password, user_type, is_deleted,
+                          created_at
+            ){profile_insert}
+            SELECT * FROM new_user
         """
 
-        user_id = uuid4()
         try:
             # Insert new user
-            row = await self.connection.fetchrow(
-                query,
-                user_id,
-                user_data.email_id,
-                str(user_data.mobile_no),
-                user_data.password,
-                user_data.user_type.value,
-            )
+            row = await self.connection.fetchrow(query, *args)
         except asyncpg.UniqueViolationError as e:
             get_logger().error(f"Unique constraint violation during update: {e}")
             if "email_id" in str(e):
                 raise EmailAlreadyExistsException(user_data.email_id)
             elif "mobile_no" in str(e):
                 raise MobileNumberAlreadyExistsException(user_data.mobile_no)
+            elif "gst_no" in str(e):
+                raise ShopOwnerAlreadyExists(context={"gst_no": profile.gst_no})
             raise e
+        if isinstance(profile, CreateDeliveryPartner):
+            await drop_pincode_partners(self.connection, profile.address.pincode)
         return UserInDB(
             id=row["id"],
             email_id=row["email_id"],
@@ -49,6 +83,40 @@ class UserRepository:
             created_at=row["created_at"],
         )
 
+    def _profile_insert(self, profile: Optional[Profile], args: list) -> str:
+        """
+        Data-modifying CTE inserting the profile of the user inserted by the
+        `new_user` CTE. The profile values are appended to `args`.
+        """
+        if profile is None:
+            return ""
+        if isinstance(profile, CreateCustomer):
+            table, columns = "customers", ["name", "address", "loyalty_points"]
+            args.extend((profile.name, profile.address, profile.loyalty_points))
+        elif isinstance(profile, CreateDeliveryPartner):
+            table, columns = "delivery_partners", ["name", "address"]
+            args.extend((profile.name, profile.address))
+        else:
+            table = "shop_owner"
+            columns = ["name", "owner_name", "gst_no", "address", "bank_details"]
+            args.extend(
+                (
+                    profile.name,
+                    profile.owner_name,
+                    profile.gst_no,
+                    profile.address,
+                    profile.bank_details,
+                )
+            )
+        first = len(args) - len(columns) + 1
+        placeholders = ", ".join(f"${first + index}" for index in range(len(columns)))
+        return f""",
+            new_profile AS (
+                INSERT INTO {table} (id, {", ".join(columns)})
+                SELECT id, {placeholders} FROM new_user
+                RETURNING id
+            )"""
+
     async def get_user_by_id(
         self, user_id: UUID, include_deleted: bool = False
     ) -> Optional[UserInDB]:
@@ -153,20 +221,36 @@ class UserRepository:
             password = $1
         WHERE id = $2 AND is_deleted = FALSE;
         """
-        print(user_id, password)
         await self.connection.execute(query, password, user_id)
 
+    async def replace_password_hash(
+        self, user_id: UUID, current_hash: str, new_hash: str
+    ) -> bool:
+        """Replace a password hash, unless the password was changed meanwhile"""
+        query = """
+        UPDATE users
+        SET password = $3
+        WHERE id = $1 AND password = $2 AND is_deleted = FALSE
+        """
+        result = await self.connection.execute(query, user_id, current_hash, new_hash)
+        return result != "UPDATE 0"
+
     async def delete_user(self, user_id: UUID) -> bool:
         """Soft delete a user by setting is_deleted = TRUE"""
-        query = """
+        query = f"""
             UPDATE users
             SET is_deleted = TRUE
             WHERE id = $1 AND is_deleted = FALSE
-            RETURNING id
+            RETURNING id, {DELETED_PARTNER_PINCODE}
         """
 
         try:
             row = await self.connection.fetchrow(query, user_id)
+            if row is not None:
+                await InvalidationBus.publish(
+                    self.connection, CacheEntity.USER_TOKENS, user_id
+                )
+                await drop_pincode_partners(self.connection, row["partner_pincode"])
             return row is not None
         except Exception as e:
             get_logger().error(f"Error soft deleting user {user_id}: {e}")
@@ -179,49 +263,75 @@ class UserRepository:
         user_type: Optional[UserType] = None,
         include_deleted: bool = False,
         search: Optional[str] = None,
-    ) -> tuple[List[UserResponse], int]:
-        """List users with pagination and filtering"""
-        offset = (page - 1) * page_size
+        cursor: Optional[str] = None,
+        exact_count: bool = False,
+    ) -> tuple[List[UserResponse], int, bool, Optional[str]]:
+        """
+        List users with keyset pagination and filtering.
+
+        Returns the users of the page, the total, whether that total is an
+        estimate and the cursor of the next page. The total is estimated by the
+        planner unless `exact_count` is set, as counting means scanning every
+        matching row. `page` is only used when no cursor is given.
+        """
         where_clauses = []
         params = []
-        param_count = 1
 
         if not include_deleted:
             where_clauses.append("is_deleted = FALSE")
 
         if user_type is not None:
-            where_clauses.append(f"user_type = ${param_count}")
             params.append(user_type.value)
-            param_count += 1
+            where_clauses.append(f"user_type = ${len(params)}")
 
         if search:
+            # Served by the trigram indexes on email_id and mobile_no
+            params.append(f"%{search}%")
             where_clauses.append(
-                f"(email_id ILIKE ${param_count} OR mobile_no ILIKE ${param_count})"
+                f"(email_id ILIKE ${len(params)} OR mobile_no ILIKE ${len(params)})"
             )
-            params.append(f"%{search}%")
-            param_count += 1
 
+        filters = list(params)
         where_clause = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
 
-        # Count query
-        count_query = f"SELECT COUNT(*) FROM users {where_clause}"
+        if cursor is not None:
+            where_clauses.append(keyset_condition(cursor, params))
+            offset = 0
+        else:
+            offset = (page - 1) * page_size
+        page_clause = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
 
         # Data query
         data_query = f"""
             SELECT id, email_id, mobile_no, user_type, is_deleted, created_at
             FROM users
-            {where_clause}
-            ORDER BY created_at DESC
-            LIMIT ${param_count} OFFSET ${param_count + 1}
+            {page_clause}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ${len(params) + 1} OFFSET ${len(params) + 2}
         """
-        params.extend([page_size, offset])
+        params.extend([page_size + 1, offset])
 
         try:
-            # Get total count
-            total = await self.connection.fetchval(count_query, *params[:-2])
+            if exact_count:
+                total = await self.connection.fetchval(
+                    f"SELECT COUNT(*) FROM users {where_clause}", *filters
+                )
+            elif where_clause:
+                # Rows the planner expects the filtered query to return
+                plan = await self.connection.fetchval(
+                    f"EXPLAIN (FORMAT JSON) SELECT 1 FROM users {where_clause}",
+                    *filters,
+                )
+                total = int(plan[0]["Plan"]["Plan Rows"])
+            else:
+                total = await self.connection.fetchval(
+                    "SELECT greatest(reltuples, 0)::bigint FROM pg_class"
+                    " WHERE oid = 'users'::regclass"
+                )
 
             # Get users
             rows = await self.connection.fetch(data_query, *params)
+            rows, next_cursor = next_page(rows, page_size)
 
             users = [
                 UserResponse(
@@ -235,7 +345,7 @@ class UserRepository:
                 for row in rows
             ]
 
-            return users, total
+            return users, total, not exact_count, next_cursor
 
         except Exception as e:
             get_logger().error(f"Error listing users: {e}")
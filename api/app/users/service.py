@@ -1,20 +1,19 @@
+import asyncio
 from random import randint
 from typing import List, Optional
-from uuid import UUID
+from uuid import UUID, uuid4
 
 import asyncpg
 from structlog import get_logger
 
 from app.base.schemas import Address
 from app.customers.models import Addresses, CreateCustomer
-from app.customers.service import CustomerService
+from app.database import PgPool
 from app.delivery_partner.models import CreateDeliveryPartner
-from app.delivery_partner.repository import DeliveryPartnerRepository
-from app.delivery_partner.service import DeliveryPartnerService
+from app.shop_owner.exceptions import ShopOwnerAlreadyExists
 from app.shop_owner.models import BankDetails, CreateShopOwner
-from app.shop_owner.repository import ShopOwnerRepository
-from app.shop_owner.service import ShopOwnerService
-from app.utils.argon2 import hash_password, verify_password
+from app.users.dependency import revoke_tokens
+from app.utils.argon2 import hash_password, needs_rehash, verify_password
 from app.utils.paseto import generate_token
 
 from .exceptions import (
@@ -32,10 +31,32 @@ from .models import (
     UserResponse,
     UserType,
 )
-from .repository import UserRepository
+from .repository import Profile, UserRepository
 
 logger = get_logger()
 
+# Strong references to running background tasks, see `asyncio.create_task`
+background_tasks: set[asyncio.Task] = set()
+
+
+async def rehash_password(user_id: UUID, current_hash: str, password: str) -> None:
+    """
+    Upgrades a password hash to the configured argon2 parameters. Runs after
+    the login response on its own pooled connection; failures are only logged
+    as the next login retries.
+    """
+    try:
+        new_hash = await hash_password(password)
+        async with PgPool.lease() as connection:
+            replaced = await UserRepository(connection).replace_password_hash(
+                user_id, current_hash, new_hash
+            )
+        logger.info(event="password_rehashed", user_id=str(user_id), replaced=replaced)
+    except Exception as e:
+        logger.warning(
+            event="password_rehash_failed", user_id=str(user_id), error=str(e)
+        )
+
 
 class UserService:
     def __init__(self, connection: asyncpg.Connection):
@@ -45,7 +66,7 @@ class UserService:
         """Create a new user with hashed password"""
         try:
             # Hash the password before storing
-            hashed_password = hash_password(user_data.password)
+            hashed_password = await hash_password(user_data.password)
 
             # Create a new UserCreate object with hashed password
             user_with_hashed_password = UserCreate(
@@ -56,62 +77,13 @@ class UserService:
                 password=hashed_password,
             )
 
-            # Create user in database
-            user_in_db = await self.repository.create_user(user_with_hashed_password)
-            if user_in_db.user_type == UserType.CUSTOMER:
-                await CustomerService(
-                    connection=self.repository.connection
-                ).create_customer(
-                    CreateCustomer(
-                        id=user_in_db.id,
-                        name=user_with_hashed_password.name,
-                        address=Addresses(
-                            address={
-                                "temp": Address(
-                                    street="",
-                                    city="",
-                                    state="",
-                                    country="",
-                                    pincode="396001",
-                                )
-                            }
-                        ),
-                    )
-                )
-            elif user_in_db.user_type == UserType.DELIVERY_PARTNER:
-                await DeliveryPartnerService(
-                    DeliveryPartnerRepository(self.repository.connection)
-                ).create_delivery_partner(
-                    CreateDeliveryPartner(
-                        id=user_in_db.id,
-                        name=user_with_hashed_password.name,
-                        address=Address(
-                            street="", city="", state="", country="", pincode="396001"
-                        ),
-                    )
-                )
-            elif user_in_db.user_type == UserType.SHOP_OWNER:
-                await ShopOwnerService(
-                    ShopOwnerRepository(self.repository.connection)
-                ).create_shop_owner(
-                    CreateShopOwner(
-                        id=user_in_db.id,
-                        name=user_with_hashed_password.name,
-                        owner_name="",
-                        gst_no="24AAAAA"
-                        + str(randint(0, 9))
-                        + str(randint(0, 9))
-                        + str(randint(0, 9))
-                        + str(randint(0, 9))
-                        + "H1Z0",
-                        address=Address(
-                            street="", city="", state="", country="", pincode="396001"
-                        ),
-                        bank_details=BankDetails(
-                            account_number="", ifsc_code="", bank_name="", branch=""
-                        ),
-                    )
-                )
+            # Create user and the profile of its role in a single statement
+            user_id = uuid4()
+            user_in_db = await self.repository.create_user(
+                user_with_hashed_password,
+                user_id=user_id,
+                profile=self._default_profile(user_id, user_with_hashed_password),
+            )
             # Return public response (without password)
             return UserResponse(
                 id=user_in_db.id,
@@ -122,13 +94,65 @@ class UserService:
                 created_at=user_in_db.created_at,
             )
 
-        except (EmailAlreadyExistsException, MobileNumberAlreadyExistsException):
+        except (
+            EmailAlreadyExistsException,
+            MobileNumberAlreadyExistsException,
+            ShopOwnerAlreadyExists,
+        ):
             # Re-raise these specific exceptions
             raise
         except Exception as e:
             logger.error(f"Error creating user: {e}")
             raise
 
+    def _default_profile(
+        self, user_id: UUID, user_data: UserCreate
+    ) -> Optional[Profile]:
+        """Profile created for a new user of a role, filled in by the user later"""
+        if user_data.user_type == UserType.CUSTOMER:
+            return CreateCustomer(
+                id=user_id,
+                name=user_data.name,
+                address=Addresses(
+                    address={
+                        "temp": Address(
+                            street="",
+                            city="",
+                            state="",
+                            country="",
+                            pincode="396001",
+                        )
+                    }
+                ),
+            )
+        elif user_data.user_type == UserType.DELIVERY_PARTNER:
+            return CreateDeliveryPartner(
+                id=user_id,
+                name=user_data.name,
+                address=Address(
+                    street="", city="", state="", country="", pincode="396001"
+                ),
+            )
+        elif user_data.user_type == UserType.SHOP_OWNER:
+            return CreateShopOwner(
+                id=user_id,
+                name=user_data.name,
+                owner_name="",
+                gst_no="24AAAAA"
+                + str(randint(0, 9))
+                + str(randint(0, 9))
+                + str(randint(0, 9))
+                + str(randint(0, 9))
+                + "H1Z0",
+                address=Address(
+                    street="", city="", state="", country="", pincode="396001"
+                ),
+                bank_details=BankDetails(
+                    account_number="", ifsc_code="", bank_name="", branch=""
+                ),
+            )
+        return None
+
     async def get_user_by_id(
         self, user_id: UUID, include_deleted: bool = False
     ) -> UserResponse:
@@ -193,10 +217,16 @@ class UserService:
                 raise UserNotFoundException(email=login_data.email_id)
 
             # Verify password
-            if not verify_password(user.password, login_data.password):
+            if not await verify_password(user.password, login_data.password):
                 raise UserNotFoundException(email=login_data.email_id)
+            if needs_rehash(user.password):
+                task = asyncio.create_task(
+                    rehash_password(user.id, user.password, login_data.password)
+                )
+                background_tasks.add(task)
+                task.add_done_callback(background_tasks.discard)
             user_payload = UserPayload(id=user.id, role=user.user_type)
-            token = generate_token(user_payload.model_dump_json())
+            token = generate_token(user_payload.model_dump(mode="json"))
             # Return user response (without password)
             return UserAuthResponse(
                 access_token=token, role=user.user_type, user_id=user.id
@@ -221,11 +251,11 @@ class UserService:
                 raise UserNotFoundException(user_id=user_id)
 
             # Verify current password
-            if not verify_password(user.password, password_data.current_password):
+            if not await verify_password(user.password, password_data.current_password):
                 return False
 
             # Hash new password
-            new_hashed_password = hash_password(password_data.new_password)
+            new_hashed_password = await hash_password(password_data.new_password)
 
             # Update password in database
             await self.repository.update_user(
@@ -247,7 +277,9 @@ class UserService:
             if not await self.repository.user_exists(user_id):
                 raise UserNotFoundException(user_id=user_id)
 
-            return await self.repository.delete_user(user_id)
+            deleted = await self.repository.delete_user(user_id)
+            revoke_tokens(user_id)
+            return deleted
 
         except UserNotFoundException:
             raise
@@ -262,8 +294,10 @@ class UserService:
         user_type: Optional[UserType] = None,
         include_deleted: bool = False,
         search: Optional[str] = None,
+        cursor: Optional[str] = None,
+        exact_count: bool = False,
     ) -> UserListResponse:
-        """List users with pagination and filtering"""
+        """List users with keyset pagination and filtering"""
         try:
             # Validate pagination parameters
             if page < 1:
@@ -271,16 +305,28 @@ class UserService:
             if page_size < 1 or page_size > 100:
                 page_size = 10
 
-            users, total = await self.repository.list_users(
+            (
+                users,
+                total,
+                total_is_estimate,
+                next_cursor,
+            ) = await self.repository.list_users(
                 page=page,
                 page_size=page_size,
                 user_type=user_type,
                 include_deleted=include_deleted,
                 search=search,
+                cursor=cursor,
+                exact_count=exact_count,
             )
 
             return UserListResponse(
-                users=users, total=total, page=page, page_size=page_size
+                users=users,
+                total=total,
+                total_is_estimate=total_is_estimate,
+                page=page,
+                page_size=page_size,
+                next_cursor=next_cursor,
             )
 
         except Exception as e:
@@ -1,6 +1,14 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Any, Callable, ClassVar, Optional
+
 from argon2 import PasswordHasher
 from argon2.exceptions import VerifyMismatchError
+
+from app.base.exceptions import BaseException
 from app.config import Config
+from app.utils.metrics import Histogram
 
 config = Config()
 argon2 = PasswordHasher(
@@ -11,18 +19,99 @@ argon2 = PasswordHasher(
     salt_len=config.ARGON_SALT_LENGTH,
 )
 
+# Upper bounds (in seconds) suited for argon2 hashes and verifications
+ARGON_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
 
-def hash_password(password: str) -> str:
-    global argon2
-    return argon2.hash(password)
 
+class PasswordHasherSaturated(BaseException):
+    code = "PASSWORD_HASHER_SATURATED"
+    title = "Password Hasher Saturated"
 
-def verify_password(
-    hashed_password: str,
-    raw_password: str,
-):
-    global argon2
+    def __init__(
+        self,
+        detail: str = "Too many password operations in progress, retry shortly",
+        context: Optional[dict[str, Any]] = None,
+        *args: object,
+    ) -> None:
+        super().__init__(detail, context, *args)
+
+
+class Argon2Executor:
+    """
+    Runs argon2 off the event loop on a bounded thread pool.
+
+    argon2-cffi releases the GIL while hashing, so at most `max_concurrency`
+    operations run in parallel and up to `max_queue` more wait for a thread.
+    Anything beyond that is rejected right away instead of piling up.
+    """
+
+    executor: ClassVar[Optional[ThreadPoolExecutor]] = None
+    max_concurrency: ClassVar[int] = config.ARGON_MAX_CONCURRENCY
+    max_queue: ClassVar[int] = config.ARGON_MAX_QUEUE
+    in_flight: ClassVar[int] = 0
+    rejected: ClassVar[int] = 0
+    durations: ClassVar[Histogram] = Histogram(ARGON_BUCKETS)
+
+    @classmethod
+    async def run(cls, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Raises:
+            PasswordHasherSaturated: If the pool and its queue are full
+        """
+        if cls.in_flight >= cls.max_concurrency + cls.max_queue:
+            cls.rejected += 1
+            raise PasswordHasherSaturated(context={"in_flight": cls.in_flight})
+        if cls.executor is None:
+            cls.executor = ThreadPoolExecutor(
+                max_workers=cls.max_concurrency, thread_name_prefix="argon2"
+            )
+        cls.in_flight += 1
+        started = perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                cls.executor, function, *args
+            )
+        finally:
+            cls.in_flight -= 1
+            cls.durations.observe(perf_counter() - started)
+
+    @classmethod
+    def stats(cls) -> dict[str, Any]:
+        """Live statistics of the pool and its queue."""
+        return {
+            "max_concurrency": cls.max_concurrency,
+            "max_queue": cls.max_queue,
+            "in_flight": cls.in_flight,
+            "queue_depth": max(cls.in_flight - cls.max_concurrency, 0),
+            "rejected": cls.rejected,
+            "durations": cls.durations.snapshot(),
+        }
+
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls.executor is not None:
+            cls.executor.shutdown(wait=False, cancel_futures=True)
+            cls.executor = None
+
+
+def _verify(hashed_password: str, raw_password: str) -> bool:
     try:
         return argon2.verify(hashed_password, raw_password)
     except VerifyMismatchError:
-        return False
\ No newline at end of file
+        return False
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Whether a hash was made with other parameters than the configured ones."""
+    return argon2.check_needs_rehash(hashed_password)
+
+
+async def hash_password(password: str) -> str:
+    return await Argon2Executor.run(argon2.hash, password)
+
+
+async def verify_password(
+    hashed_password: str,
+    raw_password: str,
+) -> bool:
+    return await Argon2Executor.run(_verify, hashed_password, raw_password)
@@ -0,0 +1,188 @@
+from bisect import bisect_left
+from typing import Any, Iterable, Optional
+
+__all__ = [
+    "Counter",
+    "Histogram",
+    "HistogramFamily",
+    "LATENCY_BUCKETS",
+    "histogram_samples",
+    "merge_families",
+    "render_families",
+]
+
+# Sample of a metric family: name, label values by name and value
+Sample = tuple[str, dict[str, str], float]
+
+# Upper bounds (in seconds) suited for request, query and pool-acquire latencies.
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram.
+
+    Observations only happen from the event loop thread, so plain integer
+    increments are enough and no locking is required.
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # One extra slot for observations above the largest bound (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Returns cumulative bucket counts keyed by their upper bound.
+        """
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = cumulative + self.counts[-1]
+        return {"buckets": buckets, "sum": self.sum, "count": self.count}
+
+
+class Counter:
+    """
+    Monotonic counters, one per combination of label values.
+
+    Like `Histogram`, only incremented from the event loop thread.
+    """
+
+    __slots__ = ("labels", "counts")
+
+    def __init__(self, *labels: str):
+        self.labels = labels
+        self.counts: dict[tuple[str, ...], int] = {}
+
+    def inc(self, *values: str, amount: int = 1) -> None:
+        self.counts[values] = self.counts.get(values, 0) + amount
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        """Returns the label values and count of every counter."""
+        return [
+            {**dict(zip(self.labels, values)), "count": count}
+            for values, count in self.counts.items()
+        ]
+
+
+class HistogramFamily:
+    """Histograms sharing their buckets, one per combination of label values."""
+
+    __slots__ = ("labels", "buckets", "histograms")
+
+    def __init__(self, *labels: str, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.labels = labels
+        self.buckets = buckets
+        self.histograms: dict[tuple[str, ...], Histogram] = {}
+
+    def observe(self, value: float, *values: str) -> None:
+        histogram = self.histograms.get(values)
+        if histogram is None:
+            histogram = self.histograms[values] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        """Returns the label values and snapshot of every histogram."""
+        return [
+            {**dict(zip(self.labels, values)), **histogram.snapshot()}
+            for values, histogram in self.histograms.items()
+        ]
+
+
+def histogram_samples(
+    name: str, snapshot: dict[str, Any], labels: Optional[dict[str, str]] = None
+) -> list[Sample]:
+    """Prometheus samples (`_bucket`, `_sum` and `_count`) of a histogram snapshot."""
+    labels = labels or {}
+    samples = [
+        (f"{name}_bucket", {**labels, "le": bound}, count)
+        for bound, count in snapshot["buckets"].items()
+    ]
+    samples.append((f"{name}_sum", labels, snapshot["sum"]))
+    samples.append((f"{name}_count", labels, snapshot["count"]))
+    return samples
+
+
+# How the samples of a family collected by several processes are combined:
+# summed (amounts, like counters or in-flight requests) or their maximum
+# (process-wide states every worker holds a copy of, like a version)
+MERGES = {"sum": lambda a, b: a + b, "max": max}
+
+
+def merge_families(snapshots: Iterable[list[dict[str, Any]]]) -> list[dict[str, Any]]:
+    """
+    Merges the metric families collected by several processes, combining the
+    samples with the same name and labels as the `merge` of their family says
+    (summed by default).
+    """
+    families: dict[str, dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for family in snapshot:
+            merged = families.get(family["name"])
+            if merged is None:
+                merged = families[family["name"]] = {**family, "samples": {}}
+            combine = MERGES[family.get("merge", "sum")]
+            for name, labels, value in family["samples"]:
+                key = (name, tuple(sorted(labels.items())))
+                existing = merged["samples"].get(key)
+                merged["samples"][key] = (
+                    value if existing is None else combine(existing, value)
+                )
+    return [
+        {
+            **family,
+            "samples": [
+                (name, dict(labels), value)
+                for (name, labels), value in family["samples"].items()
+            ],
+        }
+        for family in families.values()
+    ]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_families(families: Iterable[dict[str, Any]]) -> str:
+    """Renders metric families in the Prometheus text exposition format."""
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family['name']} {family['help']}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for name, labels, value in family["samples"]:
+            if labels:
+                rendered = ",".join(
+                    f'{label}="{_escape(str(label_value))}"'
+                    for label, label_value in labels.items()
+                )
+                lines.append(f"{name}{{{rendered}}} {value}")
+            else:
+                lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,3 +1,6 @@
+import json
+from typing import Any
+
 from pyseto import Key, decode, encode
 
 from app.config import Config
@@ -6,7 +9,8 @@ config = Config()
 key = Key.new(version=4, purpose="local", key=config.PASETO_KEY.encode("UTF-8"))
 
 
-def generate_token(payload):
+def generate_token(payload: dict[str, Any]):
+    # The payload must be a dict for pyseto to add the `exp` claim
     token = encode(
         key,
         payload=payload,
@@ -16,6 +20,7 @@ def generate_token(payload):
     return token
 
 
-def verify_token(token):
-    payload = decode(key, token, implicit_assertion=b"odoo")
-    return payload
+def verify_token(token) -> dict[str, Any]:
+    """Decrypts a token, raising `pyseto.VerifyError` if invalid or expired."""
+    payload = decode(key, token, implicit_assertion=b"odoo", deserializer=json)
+    return payload.payload
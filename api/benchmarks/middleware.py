@@ -0,0 +1,160 @@
+"""
+Per-request overhead of the request ID, context and logging middleware.
+
+Compares the previous stack of three `BaseHTTPMiddleware` layers with the fused
+`RequestContextMiddleware`, both measured against the bare endpoint. Requests
+are driven straight through the ASGI interface and log events are rendered but
+not written, so only the middleware itself is measured.
+
+Usage (from the `api` directory):
+    python -m benchmarks.middleware [requests]
+"""
+
+import asyncio
+import sys
+from time import perf_counter
+from uuid import uuid4
+
+import structlog
+from fastapi import Request
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from structlog import get_logger
+from structlog.contextvars import bind_contextvars, clear_contextvars
+
+from app.middleware import RequestContextMiddleware
+
+
+class RequestIDMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        request_id = str(uuid4())
+        request.state.request_id = request_id
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+class ContextMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        bind_contextvars(request_id=request.state.request_id)
+        response = await call_next(request)
+        clear_contextvars()
+        return response
+
+
+class LoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        logger = get_logger()
+        logger.info(
+            event="request_recieved", method=request.method, path=request.url.path
+        )
+        response = await call_next(request)
+        logger.info(
+            event="response_sent",
+            method=request.method,
+            path=request.url.path,
+            status_code=response.status_code,
+        )
+        return response
+
+
+async def plain(request):
+    return PlainTextResponse("ok")
+
+
+async def stream(request):
+    async def chunks():
+        for _ in range(3):
+            yield b"chunk"
+
+    return StreamingResponse(chunks())
+
+
+def make_app(*middleware: Middleware) -> Starlette:
+    return Starlette(
+        routes=[Route("/", plain), Route("/stream", stream)],
+        middleware=list(middleware),
+    )
+
+
+APPS = {
+    "no middleware": make_app(),
+    "BaseHTTPMiddleware x3": make_app(
+        Middleware(RequestIDMiddleware),
+        Middleware(ContextMiddleware),
+        Middleware(LoggingMiddleware),
+    ),
+    "RequestContextMiddleware": make_app(Middleware(RequestContextMiddleware)),
+}
+
+
+async def request(app: Starlette, path: str = "/") -> list[dict]:
+    """Sends a GET request to the app, returning the messages it sent."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "server": ("bench", 80),
+        "client": ("127.0.0.1", 1234),
+    }
+    messages = []
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            # Like a server whose client is still connected
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages
+
+
+async def measure(name: str, app: Starlette, count: int, rounds: int = 5) -> float:
+    """Best per-request time in microseconds over `rounds` runs."""
+    best = float("inf")
+    for _ in range(rounds):
+        started = perf_counter()
+        for _ in range(count):
+            await request(app)
+        best = min(best, perf_counter() - started)
+    per_request = best / count * 1e6
+    print(f"{name:<28}{per_request:>8.1f} us/request")
+    return per_request
+
+
+async def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    structlog.configure(logger_factory=structlog.ReturnLoggerFactory())
+
+    # The fused middleware passes each chunk through as it is sent
+    messages = await request(APPS["RequestContextMiddleware"], "/stream")
+    headers = dict(messages[0]["headers"])
+    assert b"x-request-id" in headers
+    assert [m.get("body") for m in messages[1:4]] == [b"chunk"] * 3
+
+    print(f"Sending {count} requests")
+    results = {name: await measure(name, app, count) for name, app in APPS.items()}
+    bare = results["no middleware"]
+    legacy = results["BaseHTTPMiddleware x3"] - bare
+    fused = results["RequestContextMiddleware"] - bare
+    print(f"Overhead: {legacy:.1f} us -> {fused:.1f} us ({legacy / fused:.1f}x less)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())